@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Compare `PathMapper.dir_mapper_deep` against its previous implementation,
+which globbed `**/` and then globbed `*/` again inside every directory
+to decide whether it is a leaf.
+
+A subject/session/series tree is generated in a temporary directory.
+"""
+
+import os
+import tempfile
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import Counter
+from pathlib import Path
+
+from chris_plugin import PathMapper
+
+
+def make_tree(root: Path, subjects: int, sessions: int, series: int, files: int):
+    for subject in range(subjects):
+        for session in range(sessions):
+            for s in range(series):
+                d = root / f"sub-{subject}" / f"ses-{session}" / f"series-{s}"
+                d.mkdir(parents=True)
+                for f in range(files):
+                    (d / f"{f:04d}.dcm").touch()
+
+
+def legacy_dir_mapper_deep(input_dir: Path):
+    def is_deep_dir(p: Path) -> bool:
+        if not p.is_dir():
+            return False
+        dirs = filter(lambda subpath: subpath.is_dir(), p.glob("*/"))
+        return next(dirs, None) is None
+
+    return filter(is_deep_dir, input_dir.glob("**/"))
+
+
+def current_dir_mapper_deep(input_dir: Path):
+    return PathMapper.dir_mapper_deep(input_dir, input_dir).iter_input()
+
+
+def measure(name: str, f, input_dir: Path) -> set:
+    reads = Counter()
+    scandir = os.scandir
+
+    def counting_scandir(path="."):
+        reads[os.fspath(path)] += 1
+        return scandir(path)
+
+    os.scandir = counting_scandir
+    try:
+        start = time.perf_counter()
+        result = set(f(input_dir))
+        elapsed = time.perf_counter() - start
+    finally:
+        os.scandir = scandir
+    print(
+        f"{name:>8}: {elapsed:8.3f}s  {len(result)} leaves  "
+        f"{sum(reads.values())} directory reads "
+        f"({len(reads)} distinct)"
+    )
+    return result
+
+
+def main():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--subjects", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--series", type=int, default=10)
+    parser.add_argument("--files", type=int, default=5, help="files per series")
+    parser.add_argument("--repeat", type=int, default=3)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp)
+        make_tree(
+            input_dir, options.subjects, options.sessions, options.series, options.files
+        )
+        for _ in range(options.repeat):
+            expected = measure("legacy", legacy_dir_mapper_deep, input_dir)
+            actual = measure("current", current_dir_mapper_deep, input_dir)
+            assert actual == expected, "results differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Compare iterating over a `PathMapper` with `PathMapper.entries`: the time
+per input when every input's size is needed, and the memory used per input
+when all of them are kept in a list.
+"""
+
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib import Path
+
+from chris_plugin import PathMapper
+
+
+def pairs(mapper: PathMapper) -> int:
+    total = 0
+    for input_file, _output_file in mapper:
+        total += input_file.stat().st_size
+    return total
+
+
+def entries(mapper: PathMapper) -> int:
+    total = 0
+    for entry in mapper.entries():
+        total += entry.size
+    return total
+
+
+def main():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--files-per-dir", type=int, default=1000)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp) / "in"
+        for d in range(options.dirs):
+            subdir = input_dir / f"{d:04d}"
+            subdir.mkdir(parents=True)
+            for f in range(options.files_per_dir):
+                (subdir / f"{f:06d}.dat").write_bytes(b"x" * (f % 100))
+        n = options.dirs * options.files_per_dir
+        mapper = PathMapper(input_dir, Path(tmp) / "out", kind="file", parents=False)
+        for fn in [pairs, entries]:
+            start = time.perf_counter()
+            fn(mapper)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            kept = list(mapper if fn is pairs else mapper.entries())
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del kept
+            print(
+                f"{fn.__name__:>8}: {elapsed / n * 1e6:6.2f} us/input, "
+                f"{size / n:6.0f} bytes/input"
+            )
+
+
+if __name__ == "__main__":
+    main()
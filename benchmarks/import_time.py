@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Measure the startup latency of a *ChRIS* plugin: the time taken by a fresh
+Python process to import `chris_plugin` and decorate a main function.
+
+Each statement is run in `--repeat` new processes. The median wall time of
+a process is reported, minus the median wall time of an empty process, as
+well as the median time taken by the whole statement, measured inside the
+process, and the number of modules which it imported.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+STATEMENTS = {
+    "empty": "pass",
+    "import": "import chris_plugin",
+    "decorate": (
+        "from chris_plugin import chris_plugin\n"
+        "@chris_plugin(singleton=False)\n"
+        "def main(options, inputdir, outputdir):\n"
+        "    pass\n"
+    ),
+    "mapper": "from chris_plugin import chris_plugin, PathMapper",
+}
+
+# run by each process, timing the statement and counting new modules
+_PROBE = """
+import sys, time
+before = len(sys.modules)
+start = time.perf_counter()
+exec(compile({statement!r}, "<statement>", "exec"), {{}})
+print(time.perf_counter() - start, len(sys.modules) - before)
+"""
+
+
+def run(statement: str) -> Dict[str, float]:
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    seconds, modules = process.stdout.split()
+    return {"wall": wall, "statement": float(seconds), "modules": int(modules)}
+
+
+def main():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path, help="JSON file to write results to")
+    options = parser.parse_args()
+
+    samples: Dict[str, List[Dict[str, float]]] = {name: [] for name in STATEMENTS}
+    # interleave statements so that they are equally affected by noise
+    for _ in range(options.repeat):
+        for name, statement in STATEMENTS.items():
+            samples[name].append(run(statement))
+
+    baseline = statistics.median(s["wall"] for s in samples["empty"])
+    results = {}
+    for name, runs in samples.items():
+        wall = statistics.median(s["wall"] for s in runs)
+        statement = statistics.median(s["statement"] for s in runs)
+        modules = max(s["modules"] for s in runs)
+        results[name] = {
+            "wall_seconds": wall,
+            "startup_seconds": wall - baseline,
+            "statement_seconds": statement,
+            "modules": modules,
+        }
+        print(
+            f"{name:>10}: {wall * 1000:8.1f}ms wall  "
+            f"{(wall - baseline) * 1000:8.1f}ms over empty  "
+            f"{statement * 1000:8.1f}ms statement  {modules:4} modules"
+        )
+
+    if options.output is not None:
+        report = {"python": sys.version, "repeat": options.repeat, "results": results}
+        options.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
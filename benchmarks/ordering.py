@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Measure the makespan (time until every input is processed) of
+`PathMapper.map` with and without `order="largest-first"`,
+on inputs whose sizes follow a skewed (Pareto) distribution.
+
+Input files are sparse, and processing an input is simulated by
+sleeping for a time proportional to its size.
+"""
+
+import random
+import tempfile
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib import Path
+
+from chris_plugin import PathMapper
+
+
+def make_inputs(root: Path, count: int, alpha: float, seed: int):
+    rng = random.Random(seed)
+    for i in range(count):
+        size = int(rng.paretovariate(alpha) * 1024)
+        with (root / f"{i:06d}.dat").open("wb") as f:
+            f.truncate(size)
+
+
+def main():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--alpha", type=float, default=1.2, help="Pareto shape")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--rate", type=float, default=1e6, help="simulated bytes per second"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    def process(input_file: Path, _output_file: Path):
+        time.sleep(input_file.stat().st_size / options.rate)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp) / "in"
+        input_dir.mkdir()
+        make_inputs(input_dir, options.files, options.alpha, options.seed)
+        sizes = [p.stat().st_size for p in input_dir.iterdir()]
+        ideal = max(sum(sizes) / options.workers, max(sizes)) / options.rate
+        print(f"  lower bound: {ideal:8.3f}s")
+        for order in [None, "largest-first"]:
+            mapper = PathMapper(
+                input_dir, Path(tmp) / "out", kind="file", order=order, parents=False
+            )
+            start = time.perf_counter()
+            for _ in mapper.imap_unordered(process, workers=options.workers):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{str(order):>13}: {elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Benchmark the traversal methods of `PathMapper` on synthetic trees of
+10^3 to 10^6 files with varying depth and fan-out, and save the results as
+JSON so that runs can be compared across versions of `chris_plugin`.
+
+For every tree, each case is measured for:
+
+- wall time: best and all of `--repeat` runs, with a warm page cache
+- calls to `os.scandir`, `os.stat`, `os.lstat` and `os.open`, which
+  approximate the number of system calls (`DirEntry` methods, which
+  usually do not need a system call on Linux, are not counted)
+- peak memory allocated by Python during the run, using `tracemalloc`
+
+Counting calls and tracing memory slow things down, so they are measured
+in separate runs from the timed ones.
+
+Examples
+--------
+
+```shell
+python benchmarks/suite.py --output before.json
+git checkout my-branch
+python benchmarks/suite.py --output after.json --compare before.json
+```
+
+Generating a tree of 10^6 files takes a while. Use `--tree-dir` to keep
+generated trees between runs:
+
+```shell
+python benchmarks/suite.py --files 1000000 --tree-dir /tmp/trees
+```
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from chris_plugin import PathMapper
+
+SUFFIXES = (".dcm", ".txt", ".nii.gz")
+COUNTED = ("scandir", "stat", "lstat", "open")
+
+
+class Shape(NamedTuple):
+    files: int
+    depth: int
+    fanout: int
+
+    @property
+    def name(self) -> str:
+        return f"files-{self.files}_depth-{self.depth}_fanout-{self.fanout}"
+
+
+def parse_shape(value: str) -> Tuple[int, int]:
+    """
+    Parse a tree shape given as `DEPTHxFANOUT`, e.g. `3x10`.
+    """
+    depth, fanout = value.lower().split("x")
+    return int(depth), int(fanout)
+
+
+def make_tree(root: Path, shape: Shape) -> None:
+    """
+    Create `shape.files` empty files, spread evenly across the directories
+    at depth `shape.depth` of a tree where every directory has `shape.fanout`
+    subdirectories. Directories which would be empty are not created.
+    """
+    leaves = shape.fanout**shape.depth
+    created = set()
+    for i in range(shape.files):
+        leaf = i % leaves
+        parts = []
+        for _ in range(shape.depth):
+            leaf, digit = divmod(leaf, shape.fanout)
+            parts.append(f"d{digit}")
+        directory = os.path.join(root, *parts)
+        if directory not in created:
+            os.makedirs(directory, exist_ok=True)
+            created.add(directory)
+        name = os.path.join(directory, f"{i:07d}{SUFFIXES[i % len(SUFFIXES)]}")
+        os.close(os.open(name, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def get_tree(tree_dir: Path, shape: Shape) -> Path:
+    """
+    Create a tree in `tree_dir`, unless it was created by a previous run.
+    """
+    root = tree_dir / shape.name
+    input_dir = root / "input"
+    marker = root / "complete"
+    if not marker.exists():
+        print(f"generating {shape.name} ...", file=sys.stderr)
+        if input_dir.exists():
+            raise FileExistsError(f"Incomplete tree, please remove it: {root}")
+        input_dir.mkdir(parents=True)
+        make_tree(input_dir, shape)
+        marker.touch()
+    return input_dir
+
+
+def cases(
+    input_dir: Path, output_dir: Path, shape: Shape
+) -> Iterator[Tuple[str, Callable[[], int]]]:
+    """
+    Produce benchmark cases. Each case is a function returning the number
+    of items it processed.
+    """
+    fixed_depth = "/".join(["*"] * shape.depth + ["*.dcm"])
+    globs = {
+        "all": ["**/*"],
+        "suffix": ["**/*.dcm"],
+        "multiple": ["**/*.dcm", "**/*.nii.gz"],
+        "fixed-depth": [fixed_depth],
+    }
+    for name, g in globs.items():
+        mapper = PathMapper(input_dir, output_dir, globs=g, fail_if_empty=False)
+        yield f"iter_input[{name}]", _consume(mapper.iter_input)
+
+    files = PathMapper.file_mapper(input_dir, output_dir, fail_if_empty=False)
+    yield "count", files.count
+
+    shallow = PathMapper.dir_mapper_shallow(input_dir, output_dir, fail_if_empty=False)
+    yield "dir_mapper_shallow", _consume(shallow.iter_input)
+    deep = PathMapper.dir_mapper_deep(input_dir, output_dir, fail_if_empty=False)
+    yield "dir_mapper_deep", _consume(deep.iter_input)
+
+    inputs = list(files.iter_input())
+    suffixed = PathMapper.file_mapper(
+        input_dir, output_dir, suffix=".out", fail_if_empty=False
+    )
+    yield "output_for[verbatim]", _each(files.output_for, inputs)
+    yield "output_for[suffix]", _each(suffixed.output_for, inputs)
+
+
+def _consume(iterable: Callable[[], Iterator]) -> Callable[[], int]:
+    return lambda: sum(1 for _ in iterable())
+
+
+def _each(f: Callable[[Path], Path], inputs: List[Path]) -> Callable[[], int]:
+    def run() -> int:
+        for input_path in inputs:
+            f(input_path)
+        return len(inputs)
+
+    return run
+
+
+@contextmanager
+def counting_os_calls() -> Iterator[Counter]:
+    calls = Counter()
+    originals = {name: getattr(os, name) for name in COUNTED}
+
+    def counting(name, f):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    for name, f in originals.items():
+        setattr(os, name, counting(name, f))
+    try:
+        yield calls
+    finally:
+        for name, f in originals.items():
+            setattr(os, name, f)
+
+
+def measure(run: Callable[[], int], repeat: int) -> dict:
+    seconds = []
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = run()
+        seconds.append(time.perf_counter() - start)
+
+    with counting_os_calls() as calls:
+        run()
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "items": items,
+        "best_seconds": best,
+        "seconds": seconds,
+        "items_per_second": items / best if best else None,
+        "os_calls": {name: calls[name] for name in COUNTED},
+        "peak_bytes": peak,
+    }
+
+
+def environment() -> Dict[str, Optional[str]]:
+    try:
+        from importlib.metadata import version
+
+        chris_plugin_version = version("chris_plugin")
+    except Exception:
+        chris_plugin_version = None
+    return {
+        "chris_plugin": chris_plugin_version,
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    import subprocess
+
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, results: List[dict]) -> None:
+    """
+    Print the ratio of each case's best time to the same case in `baseline`.
+    """
+    before = {(r["tree"], r["case"]): r for r in baseline["results"]}
+    print(f"\ncompared to {baseline['environment'].get('git')}:")
+    for r in results:
+        b = before.get((r["tree"], r["case"]))
+        if b is None or not b["best_seconds"]:
+            continue
+        ratio = r["best_seconds"] / b["best_seconds"]
+        memory = r["peak_bytes"] / b["peak_bytes"] if b["peak_bytes"] else 1.0
+        print(
+            f"{r['tree']:>36} {r['case']:>24}: {ratio:6.2f}x time  "
+            f"{memory:6.2f}x memory"
+        )
+
+
+def main():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="number of files of each generated tree",
+    )
+    parser.add_argument(
+        "--shapes",
+        type=parse_shape,
+        nargs="+",
+        default=[(0, 1), (2, 32), (6, 4)],
+        help="depth and fan-out of each generated tree, as DEPTHxFANOUT",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--cases", nargs="*", help="only run cases whose names start with these"
+    )
+    parser.add_argument(
+        "--tree-dir", type=Path, help="where to keep generated trees between runs"
+    )
+    parser.add_argument("--output", type=Path, help="JSON file to write results to")
+    parser.add_argument(
+        "--compare", type=Path, help="JSON file of results of a previous run"
+    )
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree_dir = options.tree_dir or Path(tmp)
+        output_dir = Path(tmp) / "output"
+        results = []
+        for files in options.files:
+            for depth, fanout in options.shapes:
+                shape = Shape(files, depth, fanout)
+                input_dir = get_tree(tree_dir, shape)
+                for case, run in cases(input_dir, output_dir, shape):
+                    if options.cases and not case.startswith(tuple(options.cases)):
+                        continue
+                    result = measure(run, options.repeat)
+                    print(
+                        f"{shape.name:>36} {case:>24}: "
+                        f"{result['best_seconds']:8.3f}s  "
+                        f"{result['items']:>8} items  "
+                        f"{sum(result['os_calls'].values()):>8} os calls  "
+                        f"{result['peak_bytes'] / 1024:10.1f} KiB"
+                    )
+                    results.append({"tree": shape.name, "case": case, **result})
+
+    report = {"environment": environment(), "results": results}
+    if options.output is not None:
+        options.output.write_text(json.dumps(report, indent=2) + "\n")
+    if options.compare is not None:
+        compare(json.loads(options.compare.read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
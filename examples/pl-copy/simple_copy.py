@@ -1,15 +1,20 @@
-import shutil
+from collections import Counter
 from chris_plugin import chris_plugin, PathMapper
+from chris_plugin.helpers import copy_file
 
 
-def copy(input_file, output_file):
-    print(f"Copying {input_file} to {output_file}")
-    shutil.copyfile(input_file, output_file)
+def copy(input_file, output_file) -> str:
+    # outputs are never modified, so they can be hard links to the inputs
+    method = copy_file(input_file, output_file, hardlink=True)
+    print(f"Copied {input_file} to {output_file} ({method})")
+    return method
 
 
 @chris_plugin
 def main(_, inputdir, outputdir):
     print("Program started")
-    for input_file, output_file in PathMapper.file_mapper(inputdir, outputdir):
+    methods = Counter(
         copy(input_file, output_file)
-    print("Complete!~")
+        for input_file, output_file in PathMapper.file_mapper(inputdir, outputdir)
+    )
+    print(f"Complete!~ {dict(methods)}")
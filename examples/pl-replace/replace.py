@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 """
 A short yet complicated *ChRIS* plugin example which uses
-`chris_plugin.PathMapper` and `tqdm.contrib.concurrent.thread_map`
-to process multiple inputs in parallel while showing a progress bar.
+`chris_plugin.PathMapper.map` and `tqdm` to process multiple
+inputs in parallel while showing a progress bar.
 """
 
 from pathlib import Path
@@ -12,7 +12,7 @@ from dataclasses import dataclass
 import time
 import random
 import logging
-from tqdm.contrib.concurrent import thread_map
+from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 # configure logging output to show time and thread name
@@ -76,17 +76,10 @@ def main(options, inputdir: Path, outputdir: Path):
 
     logger.debug(f"Using %d threads", options.threads)
     with logging_redirect_tqdm():
-        results = thread_map(
-            lambda t: r.process_file(*t),
-            mapper,
-            max_workers=options.threads,
-            total=mapper.count(),
-            maxinterval=0.1,
-        )
-
-    # if any job failed, an exception will be raised when it's iterated over
-    for _ in results:
-        pass
+        results = mapper.map(r.process_file, workers=options.threads)
+        # if any job failed, an exception will be raised when it's iterated over
+        for _ in tqdm(results, total=mapper.count(), maxinterval=0.1):
+            pass
 
     logger.debug("done")
 
@@ -27,6 +27,7 @@ setup(
     install_requires=['importlib-metadata; python_version<"3.10"'],
     extras_require={
         "none": [],
+        "numpy": ["numpy"],
         "dev": ["pytest~=7.2", "pytest-mock~=3.10", "pytest-cov~=4.0.0"],
     },
     entry_points={
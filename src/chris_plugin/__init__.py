@@ -49,11 +49,59 @@ def main(_, input_dir, output_dir):
 
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
 from chris_plugin.chris_plugin import chris_plugin
-from chris_plugin.mapper import PathMapper, curry_name_mapper
-import chris_plugin.types as types
-import chris_plugin.helpers as helpers
+
+if TYPE_CHECKING:
+    from chris_plugin.mapper import PathMapper, curry_name_mapper
+    from chris_plugin._entry import PathEntry
+    from chris_plugin._executor import MapError
+    from chris_plugin.grouping import GroupMapper, Group
+    import chris_plugin.types as types
+    import chris_plugin.helpers as helpers
 
 __docformat__ = "numpy"
 
-__all__ = ["chris_plugin", "PathMapper", "curry_name_mapper", "types", "helpers"]
+# Every ChRIS plugin instance is a new process, so its startup time matters.
+# Submodules which are not needed by `chris_plugin` itself are imported when
+# they are first used (PEP 562).
+_LAZY = {
+    "PathMapper": "chris_plugin.mapper",
+    "PathEntry": "chris_plugin._entry",
+    "MapError": "chris_plugin._executor",
+    "curry_name_mapper": "chris_plugin.mapper",
+    "GroupMapper": "chris_plugin.grouping",
+    "Group": "chris_plugin.grouping",
+    "types": None,
+    "helpers": None,
+}
+
+__all__ = [
+    "chris_plugin",
+    "PathMapper",
+    "PathEntry",
+    "GroupMapper",
+    "Group",
+    "MapError",
+    "curry_name_mapper",
+    "types",
+    "helpers",
+]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = _LAZY[name]
+    if module is None:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,93 @@
+"""
+Writing of output files which appear in full or not at all, even if the
+plugin is killed while writing them.
+
+A file is written to a temporary file in the same directory, which is then
+renamed to its final name. Renaming is atomic, so other programs (and a
+plugin resuming after being killed) never see a partially written file.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Literal, Set
+
+Durability = Literal["none", "batch", "file"]
+"""
+See `chris_plugin.PathMapper.durability`.
+"""
+
+DURABILITIES = ("none", "batch", "file")
+
+_SYNC_THREADS = 8
+
+
+class PendingSync:
+    """
+    Outputs which have been written but not yet flushed to stable storage.
+    It is safe to use from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: List[str] = []
+        self._dirs: Set[str] = set()
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._files.append(path)
+            self._dirs.add(os.path.dirname(path))
+
+    def sync(self) -> None:
+        """
+        `fsync` every pending file, then their directories.
+        Files are synced concurrently, letting storage coalesce writes.
+        """
+        with self._lock:
+            files, self._files = self._files, []
+            dirs, self._dirs = self._dirs, set()
+        if not files:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=_SYNC_THREADS) as pool:
+            list(pool.map(_fsync, files))
+            list(pool.map(_fsync, dirs))
+
+
+def _fsync(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:  # replaced or deleted since
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(
+    path: Path, durability: Durability, pending: PendingSync
+) -> Iterator[Path]:
+    """
+    Yield a temporary path next to `path`, which is renamed to `path`
+    if the context exits without an exception, or deleted otherwise.
+    """
+    tmp = path.with_name(f".{path.name}.{os.urandom(6).hex()}.tmp")
+    try:
+        yield tmp
+        if durability == "file":
+            _fsync(str(tmp))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if durability == "file":
+        _fsync(str(path.parent))
+    elif durability == "batch":
+        pending.add(str(path))
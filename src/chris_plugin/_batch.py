@@ -0,0 +1,67 @@
+"""
+Grouping of items into batches limited by number of items and total size.
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+OPEN_BATCHES = 8
+"""
+Number of incomplete batches which an item may be packed into.
+"""
+
+
+class _Batch(List[T]):
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+
+
+def pack(
+    items: Iterable[Tuple[T, int]],
+    max_items: Optional[int],
+    max_bytes: Optional[int],
+    open_batches: int = OPEN_BATCHES,
+) -> Iterator[List[T]]:
+    """
+    Pack sized items into batches of at most `max_items` items and `max_bytes`
+    total size. An item bigger than `max_bytes` is put in a batch by itself.
+
+    Items are packed as they come using best-fit: each item is added to the
+    fullest of up to `open_batches` incomplete batches which it fits in. When
+    an item does not fit in any and there are too many incomplete batches,
+    the fullest one is yielded. This packs batches close to `max_bytes` while
+    only holding a bounded number of items in memory.
+    """
+    batches: List[_Batch] = []
+
+    def is_full(batch: _Batch) -> bool:
+        return (max_items is not None and len(batch) >= max_items) or (
+            max_bytes is not None and batch.bytes >= max_bytes
+        )
+
+    def fits(batch: _Batch, size: int) -> bool:
+        return (max_items is None or len(batch) < max_items) and (
+            max_bytes is None or batch.bytes + size <= max_bytes
+        )
+
+    for item, size in items:
+        candidates = [b for b in batches if fits(b, size)]
+        if candidates:
+            batch = max(candidates, key=lambda b: b.bytes)
+        else:
+            if len(batches) >= open_batches:
+                fullest = max(batches, key=lambda b: b.bytes)
+                batches.remove(fullest)
+                yield list(fullest)
+            batch = _Batch()
+            batches.append(batch)
+        batch.append(item)
+        batch.bytes += size
+        if is_full(batch):
+            batches.remove(batch)
+            yield list(batch)
+    batches.sort(key=lambda b: b.bytes, reverse=True)
+    for batch in batches:
+        yield list(batch)
@@ -0,0 +1,212 @@
+"""
+A queue of inputs shared by several processes, possibly on different hosts,
+through files in a shared directory. Processes claim inputs one at a time,
+so inputs are divided dynamically, without a broker.
+
+An input is claimed by exclusively creating a lease file for it. The lease
+is kept alive by touching it periodically. A lease which was not touched for
+longer than the lease duration belongs to a process which crashed, and it can
+be taken over by another process. When an input is done, a marker file is
+created and the lease is deleted.
+
+Each process also registers itself with a file while it uses the queue, so
+that the last process to finish can tell whether the directory may be removed.
+"""
+
+import hashlib
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+_LEASE = ".lease"
+_DONE = ".done"
+_ACTIVE = ".active"
+
+
+class ClaimQueue:
+    """
+    Claims of inputs by this process. It is safe to use from multiple threads.
+
+    Modification times of leases are compared to the local clock, so the
+    clocks of hosts sharing a directory must agree to within a fraction of
+    the lease duration.
+    """
+
+    def __init__(self, directory: Path, lease_seconds: float):
+        if lease_seconds <= 0:
+            raise ValueError(f"lease_seconds must be positive: {lease_seconds}")
+        self._directory = directory
+        self._lease_seconds = lease_seconds
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}\n"
+        self._held: Dict[str, Path] = {}
+        self._lock = threading.Lock()
+        self._stop: Optional[threading.Event] = None
+        self._gave_up = False
+        self._active = directory / (uuid.uuid4().hex + _ACTIVE)
+        while True:
+            directory.mkdir(parents=True, exist_ok=True)
+            try:
+                self._active.write_text(self._owner)
+                break
+            except FileNotFoundError:  # just removed by close in another process
+                continue
+
+    def _file(self, key: str, suffix: str) -> Path:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return self._directory / (name + suffix)
+
+    def is_done(self, key: str) -> bool:
+        return self._file(key, _DONE).exists()
+
+    def claim(self, key: str) -> bool:
+        """
+        Try to claim an input, identified by `key`.
+
+        :return: True if this process now holds the lease of the input,
+                 False if it is done or held by another process
+        """
+        if self.is_done(key):
+            return False
+        lease = self._file(key, _LEASE)
+        if not self._create(lease) and not self._take_over(lease):
+            return False
+        # another process could have finished it just before we created the lease
+        if self.is_done(key):
+            lease.unlink()
+            return False
+        with self._lock:
+            self._held[key] = lease
+            if self._stop is None:
+                self._stop = threading.Event()
+                threading.Thread(
+                    target=self._heartbeat, args=(self._stop,), daemon=True
+                ).start()
+        return True
+
+    def _create(self, lease: Path) -> bool:
+        try:
+            fd = os.open(lease, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        except FileNotFoundError:  # removed by close, so every input is done
+            return False
+        try:
+            os.write(fd, self._owner.encode("utf-8"))
+        finally:
+            os.close(fd)
+        return True
+
+    def _take_over(self, lease: Path) -> bool:
+        """
+        Delete `lease` if it expired, then try to create it again.
+
+        The lease is renamed before it is deleted, so that only one process can
+        delete it. If it turns out to have been renewed in the meantime (by a
+        process which took it over first), it is put back.
+        """
+        if not self._is_expired(lease):
+            return False
+        stale = lease.with_name(f"{lease.name}.{uuid.uuid4().hex}")
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return self._create(lease)
+        try:
+            if not self._is_expired(stale):
+                try:
+                    os.link(stale, lease)
+                except FileExistsError:
+                    pass
+                return False
+        finally:
+            stale.unlink()
+        return self._create(lease)
+
+    def _is_expired(self, lease: Path) -> bool:
+        try:
+            mtime = lease.stat().st_mtime
+        except FileNotFoundError:
+            return True
+        return time.time() - mtime > self._lease_seconds
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        while not stop.wait(self._lease_seconds / 3):
+            with self._lock:
+                leases = list(self._held.values())
+            for lease in leases:
+                try:
+                    os.utime(lease)
+                except FileNotFoundError:
+                    pass
+
+    def complete(self, key: str) -> None:
+        """
+        Mark an input as done, and give up its lease.
+        """
+        self._file(key, _DONE).touch()
+        self._release(key)
+
+    def release(self, key: str) -> None:
+        """
+        Give up the lease of an input without marking it as done,
+        so that another process may claim it.
+        """
+        self._gave_up = True
+        self._release(key)
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            lease = self._held.pop(key, None)
+        if lease is not None:
+            try:
+                lease.unlink()
+            except FileNotFoundError:
+                pass
+
+    def release_all(self) -> None:
+        """
+        Give up every lease held by this process.
+        """
+        with self._lock:
+            keys = list(self._held)
+            if self._stop is not None:
+                self._stop.set()
+                self._stop = None
+        for key in keys:
+            self.release(key)
+
+    def close(self, remove_if_done: bool) -> None:
+        """
+        Give up every lease held by this process, and stop using the queue.
+
+        :param remove_if_done: delete the directory if every input is done, which
+                               is assumed when this process saw every input and
+                               did not give up any, no leases are held, and no
+                               other process is using the queue. A process which
+                               starts using the directory afterwards does not know
+                               that the inputs were done.
+        """
+        self.release_all()
+        try:
+            self._active.unlink()
+        except FileNotFoundError:
+            return
+        if not remove_if_done or self._gave_up:
+            return
+        try:
+            with os.scandir(self._directory) as it:
+                if any(e.name.endswith((_LEASE, _ACTIVE)) for e in it):
+                    return
+            # rename first, so that processes which start now do not use it
+            removed = self._directory.with_name(
+                f".{self._directory.name}.{uuid.uuid4().hex}"
+            )
+            os.rename(self._directory, removed)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(removed, ignore_errors=True)
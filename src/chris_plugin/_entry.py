@@ -0,0 +1,84 @@
+import os
+import stat
+from pathlib import Path
+from typing import Iterator, Optional
+
+from chris_plugin._walk import Entry
+
+
+class PathEntry:
+    """
+    An input and output pair yielded by `chris_plugin.PathMapper.entries`,
+    with information about the input which was collected while finding it.
+
+    Paths are stored as `str`. `pathlib.Path` objects are only created when
+    `input_path` or `output_path` are accessed.
+
+    Like a tuple of `(input_path, output_path)`, it can be unpacked:
+
+    ```python
+    for input_file, output_file in mapper.entries():
+        ...
+    ```
+    """
+
+    __slots__ = ("input", "output", "size", "mtime_ns", "inode", "is_dir")
+
+    def __init__(
+        self,
+        input: str,
+        output: str,
+        size: int,
+        mtime_ns: int,
+        inode: int,
+        is_dir: bool,
+    ):
+        self.input = input
+        """Input path"""
+        self.output = output
+        """Output path"""
+        self.size = size
+        """Size of the input in bytes"""
+        self.mtime_ns = mtime_ns
+        """Modification time of the input in nanoseconds since the epoch"""
+        self.inode = inode
+        """Inode number of the input"""
+        self.is_dir = is_dir
+        """Whether the input is a directory"""
+
+    @classmethod
+    def of(cls, input: str, output: str, entry: Optional[Entry]) -> "PathEntry":
+        """
+        Create a `PathEntry` using the `stat` cached by `entry` if available.
+        """
+        try:
+            st = os.stat(input) if entry is None else entry.stat()
+        except OSError:  # e.g. a broken symbolic link
+            st = os.lstat(input)
+        return cls(
+            input,
+            output,
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_ino,
+            stat.S_ISDIR(st.st_mode),
+        )
+
+    @property
+    def input_path(self) -> Path:
+        return Path(self.input)
+
+    @property
+    def output_path(self) -> Path:
+        return Path(self.output)
+
+    def __iter__(self) -> Iterator[Path]:
+        yield self.input_path
+        yield self.output_path
+
+    def __repr__(self) -> str:
+        return (
+            f"PathEntry(input={self.input!r}, output={self.output!r}, "
+            f"size={self.size}, mtime_ns={self.mtime_ns}, inode={self.inode}, "
+            f"is_dir={self.is_dir})"
+        )
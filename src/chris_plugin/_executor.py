@@ -0,0 +1,174 @@
+"""
+Run a function over the pairs of a `chris_plugin.PathMapper` using a pool of
+threads or processes.
+
+Only a bounded number of tasks are submitted to the pool at any time,
+so memory usage does not grow with the number of inputs.
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+T = TypeVar("T")
+Pair = Tuple[Path, Path]
+ExecutorType = Literal["thread", "process"]
+_Failures = List[Tuple[Path, Path, BaseException]]
+
+
+class MapError(Exception):
+    """
+    Raised by `PathMapper.map` with `fail_fast=False` after every input was
+    processed, if the function raised an exception for any of them.
+    """
+
+    def __init__(self, failures: _Failures):
+        self.failures = failures
+        """
+        Input path, output path, and exception for each failed input.
+        """
+        summary = "\n".join(
+            f"  {input_path}: {e!r}" for input_path, _, e in failures[:10]
+        )
+        if len(failures) > 10:
+            summary += f"\n  ... and {len(failures) - 10} more"
+        super().__init__(f"{len(failures)} input(s) failed:\n{summary}")
+
+
+def _create_executor(executor: ExecutorType, workers: int) -> "Executor":
+    # concurrent.futures is imported when needed, because it is slow to import
+    if executor == "thread":
+        from concurrent.futures import ThreadPoolExecutor
+
+        return ThreadPoolExecutor(max_workers=workers)
+    if executor == "process":
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError(f'executor must be "thread" or "process", not {executor!r}')
+
+
+def bounded_map(
+    fn: Callable[[Path, Path], T],
+    pairs: Iterable[Pair],
+    executor: Union[ExecutorType, "Executor"],
+    workers: int,
+    max_pending: int,
+    ordered: bool,
+    fail_fast: bool,
+    on_success: Optional[Callable[[Path, Path], None]] = None,
+) -> Iterator[T]:
+    """
+    Implementation of `PathMapper.map`.
+
+    `on_success` is called in the calling thread with the input and output
+    paths of every call to `fn` which did not raise an exception.
+    """
+    from concurrent.futures import Executor
+
+    if max_pending < 1:
+        raise ValueError(f"max_pending must be at least 1: {max_pending}")
+    owned = not isinstance(executor, Executor)
+    pool = _create_executor(executor, workers) if owned else executor
+    failures: Optional[_Failures] = None if fail_fast else []
+    pending: Dict["Future", Pair] = {}
+    collect = _Collector(pending, failures, on_success)
+    try:
+        if ordered:
+            yield from _map_ordered(fn, pairs, pool, max_pending, collect)
+        else:
+            yield from _map_unordered(fn, pairs, pool, max_pending, collect)
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+    finally:
+        if owned:
+            pool.shutdown(wait=True)
+    if failures:
+        raise MapError(failures)
+
+
+def _map_ordered(
+    fn: Callable[[Path, Path], T],
+    pairs: Iterable[Pair],
+    pool: "Executor",
+    max_pending: int,
+    collect: "_Collector",
+) -> Iterator[T]:
+    queue: Deque["Future"] = deque()
+    for pair in pairs:
+        future = pool.submit(fn, *pair)
+        collect.pending[future] = pair
+        queue.append(future)
+        if len(queue) >= max_pending:
+            yield from collect(queue.popleft())
+    while queue:
+        yield from collect(queue.popleft())
+
+
+def _map_unordered(
+    fn: Callable[[Path, Path], T],
+    pairs: Iterable[Pair],
+    pool: "Executor",
+    max_pending: int,
+    collect: "_Collector",
+) -> Iterator[T]:
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pending = collect.pending
+    for pair in pairs:
+        while len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from collect(future)
+        pending[pool.submit(fn, *pair)] = pair
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from collect(future)
+
+
+class _Collector:
+    """
+    Waits for a task to finish, and yields its result. If the task raised an
+    exception and `failures` is `None`, the exception is raised.
+    """
+
+    def __init__(
+        self,
+        pending: Dict["Future", Pair],
+        failures: Optional[_Failures],
+        on_success: Optional[Callable[[Path, Path], None]],
+    ):
+        self.pending = pending
+        self.failures = failures
+        self.on_success = on_success
+
+    def __call__(self, future: "Future") -> Iterator[T]:
+        e = future.exception()
+        input_path, output_path = self.pending.pop(future)
+        if e is None:
+            if self.on_success is not None:
+                self.on_success(input_path, output_path)
+            yield future.result()
+        elif self.failures is None:
+            raise e
+        else:
+            self.failures.append((input_path, output_path, e))
@@ -0,0 +1,81 @@
+"""
+A compact set of file identities, for finding paths which lead to the same file.
+"""
+
+from array import array
+from typing import Dict
+
+_MASK = 2**64 - 1
+_FIBONACCI = 0x9E3779B97F4A7C15
+
+
+class _Table:
+    """
+    Hash set of 64-bit integers stored in an `array`, using open addressing
+    with linear probing. Zero marks an empty slot, so values are offset by one.
+    """
+
+    __slots__ = ("_slots", "_bits", "_count")
+
+    def __init__(self, bits: int = 10):
+        self._slots = array("Q", bytes(8 << bits))
+        self._bits = bits
+        self._count = 0
+
+    def add(self, value: int) -> bool:
+        if 3 * self._count >= 2 << self._bits:  # load factor 2/3
+            self._grow()
+        return self._insert(value + 1)
+
+    def _insert(self, key: int) -> bool:
+        slots = self._slots
+        mask = len(slots) - 1
+        i = ((key * _FIBONACCI) & _MASK) >> (64 - self._bits)
+        while True:
+            current = slots[i]
+            if current == key:
+                return False
+            if current == 0:
+                slots[i] = key
+                self._count += 1
+                return True
+            i = (i + 1) & mask
+
+    def _grow(self) -> None:
+        old = self._slots
+        self._bits += 1
+        self._slots = array("Q", bytes(8 << self._bits))
+        self._count = 0
+        for key in old:
+            if key:
+                self._insert(key)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class InodeSet:
+    """
+    A set of `(st_dev, st_ino)` pairs, which uses 12 to 24 bytes per pair
+    (compared to about 100 bytes for a `set` of tuples).
+    """
+
+    def __init__(self):
+        self._devices: Dict[int, _Table] = {}
+        self._overflow = set()
+
+    def add(self, dev: int, ino: int) -> bool:
+        """
+        :return: True if the pair was not in the set before
+        """
+        if ino >= _MASK:  # cannot be offset by one
+            before = len(self._overflow)
+            self._overflow.add((dev, ino))
+            return len(self._overflow) > before
+        table = self._devices.get(dev)
+        if table is None:
+            table = self._devices[dev] = _Table()
+        return table.add(ino)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._devices.values())) + len(self._overflow)
@@ -0,0 +1,145 @@
+"""
+An append-only record of which inputs of a `chris_plugin.PathMapper` were
+processed completely, which makes it possible to resume an interrupted run.
+
+Each line of the journal is a JSON object describing one completed pair:
+the input and output paths relative to their directories, and the size
+and modification time of the input file when it was processed.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BATCH_SIZE = 1000
+"""
+Number of completed pairs buffered before they are written to the journal.
+"""
+
+BATCH_INTERVAL = 5.0
+"""
+Maximum number of seconds a completed pair is buffered.
+"""
+
+_Record = Tuple[str, int, int]
+"""
+Relative output path, input size in bytes, and input mtime in nanoseconds.
+"""
+
+
+class Journal:
+    """
+    A journal file of completed pairs. Completions are buffered and written
+    in batches, so the cost per pair is one `stat` of the input file.
+    """
+
+    def __init__(self, path: Path, input_dir: Path, output_dir: Path):
+        self._path = path
+        self._input_dir = input_dir
+        self._output_dir = output_dir
+        self._done: Dict[str, _Record] = {}
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with self._path.open("r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._done[record["input"]] = (
+                            record["output"],
+                            record["size"],
+                            record["mtime_ns"],
+                        )
+                    except (ValueError, KeyError, TypeError):
+                        # last line may be truncated if the process was killed
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _rel(self, input_path: Path, output_path: Path) -> Tuple[str, str]:
+        rel_input = str(input_path.relative_to(self._input_dir))
+        try:
+            return rel_input, str(output_path.relative_to(self._output_dir))
+        except ValueError:  # name_mapper may put outputs outside of output_dir
+            return rel_input, str(output_path)
+
+    def is_done(self, input_path: Path, output_path: Path) -> bool:
+        """
+        Check whether the given pair was completed by a previous run
+        and its input has not changed since.
+        """
+        rel_input, rel_output = self._rel(input_path, output_path)
+        record = self._done.get(rel_input)
+        if record is None:
+            return False
+        try:
+            st = input_path.stat()
+        except FileNotFoundError:
+            return False
+        return record == (rel_output, st.st_size, st.st_mtime_ns)
+
+    def record(self, input_path: Path, output_path: Path) -> None:
+        """
+        Record that the given pair was completed.
+        """
+        rel_input, rel_output = self._rel(input_path, output_path)
+        st = input_path.stat()
+        line = json.dumps(
+            {
+                "input": rel_input,
+                "output": rel_output,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+        )
+        with self._lock:
+            self._done[rel_input] = (rel_output, st.st_size, st.st_mtime_ns)
+            self._buffer.append(line)
+            if (
+                len(self._buffer) >= BATCH_SIZE
+                or time.monotonic() - self._last_flush >= BATCH_INTERVAL
+            ):
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Write buffered completions to the journal file.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._file = self._open()
+        self._file.write("".join(line + "\n" for line in self._buffer))
+        self._file.flush()
+        self._buffer.clear()
+
+    def _open(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        f = self._path.open("a")
+        # begin on a new line if the last write was cut short
+        if f.tell() > 0:
+            with self._path.open("rb") as r:
+                r.seek(-1, os.SEEK_END)
+                if r.read(1) != b"\n":
+                    f.write("\n")
+        return f
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
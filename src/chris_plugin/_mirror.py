@@ -0,0 +1,92 @@
+"""
+Copying of the input files which a `chris_plugin.PathMapper` does not yield
+into its output directory, in the background.
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from chris_plugin._walk import Exclude, walk
+from chris_plugin.helpers import CopyMethod, copy_file
+
+
+class Mirror:
+    """
+    A thread which copies every file under `input_dir` to the same relative
+    path under `output_dir`, except for those where `is_input` returns True.
+    Existing output files are not overwritten, and neither are the outputs of
+    inputs, so files are copied once every input has been found.
+    """
+
+    def __init__(
+        self,
+        input_dir: str,
+        output_dir: str,
+        is_input: Callable[[str, str], bool],
+        output_for: Callable[[str], str],
+        exclude: Sequence[Exclude],
+        hardlink: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        is_input: Callable
+            called with the relative path and the path of a file under `input_dir`
+        output_for: Callable
+            called with the path of an input, returns the path of its output
+        hardlink: bool
+            passed to `copy_file`
+        """
+        self._input_dir = input_dir
+        self._output_dir = output_dir
+        self._is_input = is_input
+        self._output_for = output_for
+        self._exclude = exclude
+        self._hardlink = hardlink
+        self._thread = threading.Thread(target=self._run, name="mirror", daemon=True)
+        self._error: Optional[BaseException] = None
+        self.methods: "Counter[CopyMethod]" = Counter()
+        """
+        Number of files copied using each method.
+        """
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def join(self) -> None:
+        """
+        Wait for every file to be copied, and raise the exception which
+        stopped the thread, if any.
+        """
+        self._thread.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        try:
+            self._mirror()
+        except BaseException as e:
+            self._error = e
+
+    def _mirror(self) -> None:
+        prefix_len = len(os.path.join(self._input_dir, ""))
+        outputs: Set[str] = set()
+        others: List[Tuple[str, str]] = []
+        for entry in walk(self._input_dir, ["**/*"], "file", self._exclude):
+            rel_path = entry.path[prefix_len:]
+            if self._is_input(rel_path, entry.path):
+                outputs.add(os.path.normpath(self._output_for(entry.path)))
+            else:
+                others.append((entry.path, os.path.join(self._output_dir, rel_path)))
+        created_dir = None
+        for src, dst in others:
+            if dst in outputs or os.path.lexists(dst):
+                continue
+            parent = os.path.dirname(dst)
+            if parent != created_dir:  # files of a directory are found together
+                os.makedirs(parent, exist_ok=True)
+                created_dir = parent
+            self.methods[copy_file(src, dst, hardlink=self._hardlink)] += 1
@@ -0,0 +1,54 @@
+"""
+Strategies for the order in which `chris_plugin.PathMapper` yields its inputs.
+
+Every strategy is a sort key of `os.DirEntry`, so it can use the file type and
+inode number which are already known from reading the directory, as well as
+the `stat` result which `os.DirEntry` caches.
+"""
+
+import os
+from typing import Any, Callable, Dict, Literal, Union
+
+from chris_plugin._walk import Entry
+
+OrderName = Literal["largest-first", "inode", "directory"]
+SortKey = Callable[[Entry], Any]
+
+
+def _largest_first(entry: Entry) -> int:
+    """
+    Longest processing time first (LPT): with a pool of workers, starting the
+    biggest inputs first avoids a few big inputs starting last and delaying
+    the end of the run.
+    """
+    try:
+        return -entry.stat().st_size
+    except OSError:  # e.g. broken symbolic link
+        return 0
+
+
+def _inode(entry: Entry) -> int:
+    """
+    Ascending inode number, which roughly follows the placement of files on
+    disk for common filesystems, making reads more sequential.
+    """
+    return entry.inode()
+
+
+def _directory(entry: Entry):
+    """
+    Files of the same directory together, in ascending inode number within
+    each directory, so that readahead of directory and file data is effective.
+    """
+    return os.path.dirname(entry.path), entry.inode()
+
+
+ORDERS: Dict[str, SortKey] = {
+    "largest-first": _largest_first,
+    "inode": _inode,
+    "directory": _directory,
+}
+
+
+def sort_key(order: Union[OrderName, SortKey]) -> SortKey:
+    return ORDERS[order] if isinstance(order, str) else order
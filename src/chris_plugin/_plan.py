@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class Plan:
+    """
+    Summary of what a `chris_plugin.PathMapper` would do, produced by
+    `PathMapper.plan`.
+    """
+
+    count: int = 0
+    """Number of input paths"""
+
+    total_bytes: int = 0
+    """Total size of the input files in bytes"""
+
+    directories: int = 0
+    """Number of distinct parent directories of output paths"""
+
+    collisions: Dict[str, List[str]] = field(default_factory=dict)
+    """
+    Output paths which more than one input path maps to, and those input paths.
+    If there are any, some outputs would be overwritten.
+    """
@@ -0,0 +1,113 @@
+"""
+Warming of the page cache with the contents of upcoming input files, so that
+reading them does not stall on slow (e.g. network) storage.
+"""
+
+import os
+import queue
+import stat
+import threading
+from collections import deque
+from typing import Deque, Iterable, Iterator, Optional, Tuple
+
+from chris_plugin._walk import Entry
+from chris_plugin.limits import get_memory_limit
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+"""
+Default limit of prefetched bytes, if the memory limit is unknown or large.
+"""
+
+_READ_SIZE = 1024**2
+
+_Found = Tuple[str, Optional[Entry]]
+_Hint = Optional[Tuple[str, int]]
+
+
+def default_max_bytes() -> int:
+    """
+    :return: `DEFAULT_MAX_BYTES` or an eighth of the memory limit, whichever is less
+    """
+    limit = get_memory_limit()
+    if limit is None:
+        return DEFAULT_MAX_BYTES
+    return min(DEFAULT_MAX_BYTES, limit // 8)
+
+
+def prefetch(found: Iterable[_Found], window: int, max_bytes: int) -> Iterator[_Found]:
+    """
+    Yield from `found`, while a background thread prefetches the files of
+    up to `window` items ahead of the one which was last yielded. At most
+    `max_bytes` are prefetched for the current and upcoming items together.
+
+    Files are prefetched using `posix_fadvise(POSIX_FADV_WILLNEED)`, which
+    makes the kernel read them asynchronously. Where it is not available,
+    files are read and the data is discarded.
+    """
+    hints: "queue.SimpleQueue[_Hint]" = queue.SimpleQueue()
+    thread = threading.Thread(target=_prefetch_worker, args=(hints,), daemon=True)
+    thread.start()
+    found = iter(found)
+    ahead: Deque[Tuple[str, Optional[Entry], int]] = deque()
+    used = 0
+    exhausted = False
+    try:
+        while True:
+            while (
+                not exhausted
+                and len(ahead) <= window
+                and (not ahead or used < max_bytes)
+            ):
+                item = next(found, None)
+                if item is None:
+                    exhausted = True
+                    break
+                path, entry = item
+                size = min(_file_size(path, entry), max_bytes - used)
+                if size > 0:
+                    hints.put((path, size))
+                ahead.append((path, entry, size))
+                used += size
+            if not ahead:
+                return
+            path, entry, size = ahead[0]
+            yield path, entry
+            ahead.popleft()
+            used -= size
+    finally:
+        hints.put(None)
+
+
+def _file_size(path: str, entry: Optional[Entry]) -> int:
+    try:
+        st = os.stat(path) if entry is None else entry.stat()
+    except OSError:
+        return 0
+    return st.st_size if stat.S_ISREG(st.st_mode) else 0
+
+
+def _prefetch_worker(hints: "queue.SimpleQueue[_Hint]") -> None:
+    while True:
+        hint = hints.get()
+        if hint is None:
+            return
+        path, size = hint
+        try:
+            _prefetch_file(path, size)
+        except OSError:
+            pass
+
+
+def _prefetch_file(path: str, size: int) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+            return
+        while size > 0:
+            n = len(os.read(fd, min(size, _READ_SIZE)))
+            if n == 0:
+                break
+            size -= n
+    finally:
+        os.close(fd)
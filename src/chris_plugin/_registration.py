@@ -5,7 +5,7 @@ A mechanism for passing the plugin's arguments to the ``chris_plugin_info`` tool
 import argparse
 from chris_plugin.types import ChrisPluginType
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Callable, Optional, List
 
 
 @dataclass
@@ -14,7 +14,7 @@ class PluginDetails:
     Metadata about a *ChRIS* plugin which cannot be inferred from ``setup.py``
     """
 
-    parser: argparse.ArgumentParser
+    get_parser: Callable[[], argparse.ArgumentParser]
     type: ChrisPluginType
     category: str
     icon: str
@@ -28,6 +28,10 @@ class PluginDetails:
     min_gpu_limit: int
     max_gpu_limit: int
 
+    @property
+    def parser(self) -> argparse.ArgumentParser:
+        return self.get_parser()
+
 
 _memory: List[PluginDetails] = []
 
@@ -0,0 +1,69 @@
+"""
+Division of inputs between replicas of a plugin which run in parallel.
+"""
+
+import os
+from typing import Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_RANK_VARIABLES = (
+    ("CHRIS_PLUGIN_RANK", "CHRIS_PLUGIN_WORLD_SIZE"),
+    ("RANK", "WORLD_SIZE"),  # torchrun, and the convention used by many others
+    ("JOB_COMPLETION_INDEX", "WORLD_SIZE"),  # Kubernetes indexed Job
+    ("SLURM_PROCID", "SLURM_NTASKS"),
+    ("OMPI_COMM_WORLD_RANK", "OMPI_COMM_WORLD_SIZE"),
+    ("PMI_RANK", "PMI_SIZE"),
+)
+
+
+def detect_rank(environ: Optional[Mapping[str, str]] = None) -> Tuple[int, int]:
+    """
+    Find out which replica this process is from environment variables set by
+    common schedulers and launchers.
+
+    :return: rank of this replica, and number of replicas. `(0, 1)` if the
+             environment does not say.
+    """
+    if environ is None:
+        environ = os.environ
+    for rank_var, size_var in _RANK_VARIABLES:
+        if rank_var in environ and size_var in environ:
+            rank, size = int(environ[rank_var]), int(environ[size_var])
+            check_rank(rank, size)
+            return rank, size
+    return 0, 1
+
+
+def check_rank(rank: int, size: int) -> None:
+    if size < 1 or not 0 <= rank < size:
+        raise ValueError(f"Invalid rank {rank} of {size} replicas")
+
+
+def shard(items: Iterable[Tuple[T, str, int]], rank: int, size: int) -> List[T]:
+    """
+    Select the share of `items` belonging to replica `rank` out of `size`.
+
+    Each item is a value, a name which identifies it (e.g. its relative path),
+    and its size. Items are assigned biggest first to the replica with the
+    least total size so far ("longest processing time first"), which divides
+    the total size nearly evenly. Ties are broken by number of items. Every replica computes the same assignment
+    given the same items, in any order, so no coordination is needed.
+
+    :return: values of the selected items, in their given order
+    """
+    check_rank(rank, size)
+    items = list(items)
+    if size == 1:
+        return [value for value, _, _ in items]
+    import heapq
+
+    by_size = sorted(range(len(items)), key=lambda i: (-items[i][2], items[i][1]))
+    loads = [(0, 0, r) for r in range(size)]
+    mine = set()
+    for i in by_size:
+        load, count, r = heapq.heappop(loads)
+        if r == rank:
+            mine.add(i)
+        heapq.heappush(loads, (load + items[i][2], count + 1, r))
+    return [value for i, (value, _, _) in enumerate(items) if i in mine]
@@ -0,0 +1,150 @@
+"""
+Timing of the processing of each input of a `chris_plugin.PathMapper`.
+"""
+
+import heapq
+import json
+import math
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PERCENTILES = (50, 90, 99)
+
+
+class Stats:
+    """
+    Per-input measurements, stored in arrays so that the overhead is a few
+    dozen bytes per input.
+    """
+
+    def __init__(self, slowest: int):
+        self._slowest = slowest
+        self._heap: List[Tuple[float, str]] = []
+        self._wait = array("d")
+        self._seconds = array("d")
+        self._input_bytes = array("q")
+        self._output_bytes = array("q")
+        self._start = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._seconds)
+
+    def record(
+        self,
+        input_path: str,
+        output_path: str,
+        input_bytes: int,
+        wait: float,
+        seconds: float,
+    ) -> None:
+        """
+        Record the processing of an input.
+
+        Parameters
+        ----------
+        input_bytes: int
+            size of the input, which the caller usually knows without a `stat`
+        wait: float
+            seconds spent waiting before processing began, e.g. for the input to
+            be found, or for a worker to be available
+        seconds: float
+            seconds spent processing
+        """
+        self._wait.append(wait)
+        self._seconds.append(seconds)
+        self._input_bytes.append(input_bytes)
+        self._output_bytes.append(_size(output_path))
+        entry = (seconds, input_path)
+        if len(self._heap) < self._slowest:
+            heapq.heappush(self._heap, entry)
+        elif self._heap and entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def report(self) -> dict:
+        """
+        :return: summary statistics, which can be serialized as JSON
+        """
+        elapsed = time.monotonic() - self._start
+        total_in = sum(self._input_bytes)
+        total_out = sum(self._output_bytes)
+        return {
+            "count": len(self),
+            "elapsed_seconds": elapsed,
+            "files_per_second": len(self) / elapsed if elapsed else None,
+            "input_bytes": total_in,
+            "output_bytes": total_out,
+            "input_bytes_per_second": total_in / elapsed if elapsed else None,
+            "wait_seconds": _distribution(self._wait),
+            "processing_seconds": _distribution(self._seconds),
+            "processing_histogram": _log_histogram(self._seconds),
+            "input_file_bytes": _distribution(self._input_bytes),
+            "output_file_bytes": _distribution(self._output_bytes),
+            "slowest": [
+                {"input": path, "seconds": seconds}
+                for seconds, path in sorted(self._heap, reverse=True)
+            ],
+        }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2) + "\n")
+
+
+def _size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def _distribution(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {"min": ordered[0], "mean": sum(ordered) / len(ordered)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+    summary["max"] = ordered[-1]
+    return summary
+
+
+def _log_histogram(seconds: Sequence[float]) -> Dict[str, int]:
+    """
+    Count values in buckets with power-of-two bounds, e.g. `"<0.5s": 3`.
+    """
+    counts: Dict[int, int] = {}
+    for s in seconds:
+        exponent = math.ceil(math.log2(s)) if s > 0 else -30
+        exponent = max(exponent, -20)  # ~1 microsecond
+        counts[exponent] = counts.get(exponent, 0) + 1
+    return {f"<{2.0 ** e:g}s": counts[e] for e in sorted(counts)}
+
+
+class Timed(NamedTuple):
+    value: object
+    input_path: Path
+    output_path: Path
+    started: float
+    finished: float
+
+
+class TimedCall:
+    """
+    Wraps a function of an input and output path to also return the
+    `time.monotonic` timestamps of when it was called and when it returned.
+    (On Linux, these are comparable between processes.) It is picklable if
+    the function is.
+    """
+
+    def __init__(self, fn: Callable[[Path, Path], T]):
+        self.fn = fn
+
+    def __call__(self, input_path: Path, output_path: Path) -> Timed:
+        started = time.monotonic()
+        value = self.fn(input_path, output_path)
+        return Timed(value, input_path, output_path, started, time.monotonic())
@@ -0,0 +1,523 @@
+"""
+Single-pass directory traversal used by `chris_plugin.PathMapper`.
+
+Rather than calling `pathlib.Path.glob` once per pattern and then
+`stat`-ing every result, the input directory is read exactly once using
+`os.scandir`. Every glob pattern is matched against each directory entry
+during that one pass, and the file type information cached by
+`os.DirEntry` is reused instead of being queried again.
+
+The matching rules mirror those of `pathlib.Path.glob`:
+
+- `**` matches the directory itself and all of its subdirectories,
+  but does not descend into symbolic links to directories (unless
+  `follow_symlinks=True`, in which case cycles of links are not followed)
+- other wildcards are matched against a single path component using
+  `fnmatch` rules (case-sensitive)
+- intermediate pattern components only match directories
+- a trailing `/` means only directories are matched
+
+Unlike calling `pathlib.Path.glob` for each pattern, a path which matches
+several patterns is found once. Paths which match an exclude pattern are
+not found, and excluded directories are not read.
+"""
+
+import fnmatch
+import os
+import re
+from re import Pattern
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    FrozenSet,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+PathKind = Literal["file", "dir", "leaf"]
+"""
+Type of filesystem object which an input path is required to be.
+A "leaf" is a directory which does not contain subdirectories.
+"""
+
+_Position = Tuple[int, int]
+"""
+Index of a glob pattern and index of the pattern component to match next.
+"""
+_State = FrozenSet[_Position]
+
+Exclude = Union[str, Pattern]
+"""
+A glob pattern, or a compiled regular expression which is matched against
+the whole path relative to the directory being walked.
+"""
+
+_RECURSIVE = None
+"""
+Placeholder for the `**` component of a glob pattern.
+"""
+
+
+class _RootEntry:
+    """
+    Stand-in for `os.DirEntry` representing the directory being walked,
+    which is itself matched by patterns such as `**/`.
+    """
+
+    __slots__ = ("path", "name")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def is_dir(self, *, follow_symlinks: bool = True) -> bool:
+        return True
+
+    def is_file(self, *, follow_symlinks: bool = True) -> bool:
+        return False
+
+    def is_symlink(self) -> bool:
+        return os.path.islink(self.path)
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+    def inode(self) -> int:
+        return self.stat(follow_symlinks=False).st_ino
+
+
+Entry = Union[os.DirEntry, _RootEntry]
+
+
+class _Component:
+    """
+    Stand-in for `os.DirEntry` used by `GlobMatcher.matches_path`.
+    """
+
+    __slots__ = ("name", "_is_dir")
+
+    def __init__(self, name: str, is_dir: bool):
+        self.name = name
+        self._is_dir = is_dir
+
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    def is_symlink(self) -> bool:
+        return False
+
+
+class GlobMatcher:
+    """
+    Matches many glob patterns simultaneously, one path component at a time.
+
+    A "state" is the set of positions in every pattern which can be reached
+    by the path components matched so far. A directory is only worth
+    reading when its state contains a position which is not at the end of
+    an include pattern.
+
+    Exclude globs are matched the same way as include globs (their indices
+    come after those of the include globs). Exclude regular expressions are
+    matched separately, against relative paths.
+    """
+
+    def __init__(
+        self,
+        globs: Sequence[str],
+        exclude: Sequence[Exclude] = (),
+        follow_symlinks: bool = False,
+    ):
+        self._include = len(globs)
+        self._follow_symlinks = follow_symlinks
+        self._patterns = [_compile_glob(g) for g in globs]
+        self._patterns.extend(_compile_glob(e) for e in exclude if isinstance(e, str))
+        self._regexes = [e for e in exclude if not isinstance(e, str)]
+        self.initial: _State = self._closure((i, 0) for i in range(len(self._patterns)))
+
+    def _closure(self, positions) -> _State:
+        """
+        Add every position reachable by letting a `**` component match nothing.
+        """
+        closed = set()
+        for g, i in positions:
+            segments, _ = self._patterns[g]
+            closed.add((g, i))
+            while i < len(segments) and segments[i] is _RECURSIVE:
+                i += 1
+                closed.add((g, i))
+        return frozenset(closed)
+
+    def matches(self, state: _State, is_dir: bool) -> bool:
+        """
+        :return: True if a path in the given state matches an include pattern
+        """
+        return self._matches(state, is_dir, 0, self._include)
+
+    def is_excluded(self, state: _State, is_dir: bool, rel_path: str) -> bool:
+        """
+        :return: True if a path in the given state matches an exclude pattern
+        """
+        if self._matches(state, is_dir, self._include, len(self._patterns)):
+            return True
+        return any(r.fullmatch(rel_path) for r in self._regexes)
+
+    @property
+    def has_regexes(self) -> bool:
+        return bool(self._regexes)
+
+    def matches_path(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Check whether a relative path matches an include pattern, without
+        reading the filesystem. Components of `rel_path` other than the last
+        are assumed to be directories which are not symbolic links.
+        """
+        parts = rel_path.split(os.sep)
+        state = self.initial
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            state = self.step(state, _Component(part, is_dir if last else True))
+            if not state:
+                return False
+        return self.matches(state, is_dir)
+
+    def _matches(self, state: _State, is_dir: bool, start: int, stop: int) -> bool:
+        for g, i in state:
+            if start <= g < stop:
+                segments, dir_only = self._patterns[g]
+                if i == len(segments) and (is_dir or not dir_only):
+                    return True
+        return False
+
+    def is_live(self, state: _State) -> bool:
+        """
+        :return: True if paths under a directory in the given state could match
+        """
+        include = self._include
+        return any(g < include and i < len(self._patterns[g][0]) for g, i in state)
+
+    def step(self, state: _State, entry: Entry) -> _State:
+        """
+        Compute the state of a directory entry from the state of its parent.
+        """
+        name = entry.name
+        next_positions = []
+        is_dir: Optional[bool] = None
+        for g, i in state:
+            segments, _ = self._patterns[g]
+            if i == len(segments):
+                continue
+            segment = segments[i]
+            if segment is _RECURSIVE:
+                if entry.is_dir() and (self._follow_symlinks or not entry.is_symlink()):
+                    next_positions.append((g, i))
+            elif segment(name):
+                if i + 1 < len(segments):
+                    if is_dir is None:
+                        is_dir = entry.is_dir()
+                    if not is_dir:
+                        continue
+                next_positions.append((g, i + 1))
+        return self._closure(next_positions)
+
+
+def _compile_glob(glob: str) -> Tuple[Tuple[Optional[Callable], ...], bool]:
+    if not glob:
+        raise ValueError(f"Unacceptable pattern: {glob!r}")
+    if glob.startswith("/"):
+        raise NotImplementedError("Non-relative patterns are unsupported")
+    dir_only = glob.endswith("/")
+    segments = tuple(
+        _compile_segment(part) for part in glob.split("/") if part not in ("", ".")
+    )
+    if not segments:
+        raise ValueError(f"Unacceptable pattern: {glob!r}")
+    return segments, dir_only
+
+
+def _compile_segment(part: str) -> Optional[Callable[[str], object]]:
+    """
+    :return: a function which returns a truthy value if a name matches `part`
+    """
+    if part == "**":
+        return _RECURSIVE
+    if not any(c in part for c in "*?["):
+        return part.__eq__
+    return re.compile(fnmatch.translate(part)).match
+
+
+def _is_kind(entry: Entry, kind: Optional[PathKind]) -> bool:
+    if kind is None:
+        return True
+    if kind == "file":
+        return entry.is_file()
+    return entry.is_dir()  # whether a directory is a leaf is checked by walk
+
+
+def _scandir(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        return []
+
+
+_Ancestors = Optional[Tuple[Tuple[int, int], "_Ancestors"]]
+"""
+Linked list of the device and inode numbers of a directory and its ancestors.
+"""
+
+_Task = Tuple[Entry, Optional[_State], bool, _Ancestors]
+"""
+A directory to read, the state of its contents (`None` if nothing inside it
+can match), whether it is to be yielded if it is a leaf, and if symbolic links
+are followed, the identities of itself and its ancestors.
+"""
+
+
+def _is_ancestor(identity: Tuple[int, int], ancestors: _Ancestors) -> bool:
+    while ancestors is not None:
+        if ancestors[0] == identity:
+            return True
+        ancestors = ancestors[1]
+    return False
+
+
+class _Walker:
+    """
+    Reads one directory at a time, so that directories can be read in any order
+    or concurrently.
+    """
+
+    def __init__(
+        self,
+        globs: Sequence[str],
+        kind: Optional[PathKind],
+        exclude: Sequence[Exclude] = (),
+        follow_symlinks: bool = False,
+    ):
+        self._matcher = GlobMatcher(globs, exclude, follow_symlinks)
+        self._follow_symlinks = follow_symlinks
+        self._kind = kind
+        self._leaves_only = kind == "leaf"
+        self._prefix_len = 0
+
+    def start(self, root: str) -> Tuple[List[Entry], Optional[_Task]]:
+        """
+        :return: whether `root` itself matches, and the task of reading `root`
+        """
+        matcher = self._matcher
+        root_entry = _RootEntry(root)
+        self._prefix_len = len(os.path.join(root, ""))
+        if matcher.is_excluded(matcher.initial, True, ""):
+            return [], None
+        found = []
+        leaf = matcher.matches(matcher.initial, is_dir=True)
+        if not self._leaves_only:
+            if leaf and _is_kind(root_entry, self._kind):
+                found = [root_entry]
+            leaf = False
+        live_root = matcher.is_live(matcher.initial)
+        if not live_root and not leaf:
+            return found, None
+        ancestors = None
+        if self._follow_symlinks:
+            st = root_entry.stat()
+            ancestors = ((st.st_dev, st.st_ino), None)
+        state = matcher.initial if live_root else None
+        return found, (root_entry, state, leaf, ancestors)
+
+    def visit(self, task: _Task) -> Tuple[List[Entry], List[_Task]]:
+        """
+        Read a directory.
+
+        :return: matching entries, and the subdirectories which need to be read
+        """
+        matcher = self._matcher
+        has_regexes = matcher.has_regexes
+        directory, state, leaf, ancestors = task
+        found = []
+        subdirs = []
+        has_subdir = False
+        for entry in _scandir(directory.path):
+            is_dir = entry.is_dir()
+            has_subdir = has_subdir or is_dir
+            if state is None:
+                if has_subdir:
+                    break
+                continue
+            entry_state = matcher.step(state, entry)
+            if not entry_state:
+                continue
+            rel_path = entry.path[self._prefix_len :] if has_regexes else ""
+            if matcher.is_excluded(entry_state, is_dir, rel_path):
+                continue
+            matches = matcher.matches(entry_state, is_dir)
+            if self._leaves_only:
+                matches = matches and is_dir
+            else:
+                if matches and _is_kind(entry, self._kind):
+                    found.append(entry)
+                matches = False
+            live = is_dir and matcher.is_live(entry_state)
+            chain = None
+            if live and self._follow_symlinks:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                identity = (st.st_dev, st.st_ino)
+                if _is_ancestor(identity, ancestors):
+                    continue  # a cycle of symbolic links
+                chain = (identity, ancestors)
+            if matches or live:
+                subdirs.append((entry, entry_state if live else None, matches, chain))
+        if leaf and not has_subdir:
+            found.append(directory)
+        return found, subdirs
+
+
+def walk(
+    root: str,
+    globs: Sequence[str],
+    kind: Optional[PathKind] = None,
+    exclude: Sequence[Exclude] = (),
+    follow_symlinks: bool = False,
+) -> Iterator[Entry]:
+    """
+    Walk the directory `root` once, yielding the entries which match `globs`.
+
+    An entry is yielded once, no matter how many of `globs` it matches.
+    Entries are yielded in pre-order: the matching entries of a directory
+    come before the entries of its subdirectories.
+
+    Every directory is read at most once. When `kind="leaf"`, a matching
+    directory is yielded after it has been read and found to contain no
+    subdirectories, so no directory needs to be read a second time.
+
+    Parameters
+    ----------
+    root: str
+        directory to walk
+    globs: Sequence[str]
+        glob patterns relative to `root`
+    kind: str
+        if given, only yield entries which are of this type
+    exclude: Sequence[str | re.Pattern]
+        entries which match any of these glob patterns or regular expressions
+        are not yielded, and excluded directories are not read
+    follow_symlinks: bool
+        if True, `**` descends into symbolic links to directories. A link to
+        a directory which contains it is not followed, so cycles are avoided.
+    """
+    walker = _Walker(globs, kind, exclude, follow_symlinks)
+    found, task = walker.start(root)
+    yield from found
+    stack = [task] if task is not None else []
+    while stack:
+        found, subdirs = walker.visit(stack.pop())
+        yield from found
+        stack.extend(reversed(subdirs))
+
+
+def walk_threaded(
+    root: str,
+    globs: Sequence[str],
+    kind: Optional[PathKind] = None,
+    workers: int = 4,
+    ordered: bool = True,
+    exclude: Sequence[Exclude] = (),
+    follow_symlinks: bool = False,
+) -> Iterator[Entry]:
+    """
+    Like `walk`, but directories are read concurrently by a pool of threads,
+    one directory per task. This hides the latency of network filesystems.
+
+    Parameters
+    ----------
+    workers: int
+        number of threads
+    ordered: bool
+        If `True`, entries are yielded in the same order as `walk`.
+        Directories are read ahead of the one being yielded, up to a
+        fixed window. If `False`, the entries of each directory are
+        yielded as soon as it has been read.
+
+    See `walk` for other parameters.
+    """
+    walker = _Walker(globs, kind, exclude, follow_symlinks)
+    found, task = walker.start(root)
+    yield from found
+    if task is None:
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    window = 4 * workers
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="walk")
+    outstanding: Set["Future"] = set()
+    try:
+        if ordered:
+            yield from _walk_ordered(pool, walker, task, window, outstanding)
+        else:
+            yield from _walk_unordered(pool, walker, task, window, outstanding)
+    finally:
+        for future in outstanding:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def _walk_ordered(
+    pool: "ThreadPoolExecutor",
+    walker: _Walker,
+    task: _Task,
+    window: int,
+    outstanding: Set["Future"],
+) -> Iterator[Entry]:
+    # the stack is in the same order as in walk. Its top is read ahead.
+    stack: List[Union[_Task, "Future"]] = [task]
+    while stack:
+        for i in range(max(0, len(stack) - window), len(stack)):
+            if isinstance(stack[i], tuple):
+                stack[i] = pool.submit(walker.visit, stack[i])
+                outstanding.add(stack[i])
+        future = stack.pop()
+        found, subdirs = future.result()
+        outstanding.discard(future)
+        stack.extend(reversed(subdirs))
+        yield from found
+
+
+def _walk_unordered(
+    pool: "ThreadPoolExecutor",
+    walker: _Walker,
+    task: _Task,
+    window: int,
+    outstanding: Set["Future"],
+) -> Iterator[Entry]:
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    # not yet submitted, taken last-in first-out to keep the backlog small
+    backlog: List[_Task] = [task]
+    results: List[List[Entry]] = []
+    while True:
+        while backlog and len(outstanding) < window:
+            outstanding.add(pool.submit(walker.visit, backlog.pop()))
+        for found in results:
+            yield from found
+        if not outstanding:
+            return
+        done, _ = wait(outstanding, return_when=FIRST_COMPLETED)
+        results = []
+        for future in done:
+            outstanding.discard(future)
+            found, subdirs = future.result()
+            backlog.extend(subdirs)
+            results.append(found)
@@ -0,0 +1,311 @@
+"""
+A local, content-addressed cache of output files, which lets a *ChRIS* plugin
+skip inputs it has already processed in a previous run.
+
+An output file is cached under a key computed from the contents of its input
+file, its path relative to the output directory, the version of the plugin,
+and the plugin's options. When the same input is mapped to the same output
+path again by the same version of the plugin with the same options, the
+cached output is linked into place instead of being computed again.
+
+The cache is enabled using the `result_cache` parameter of
+`chris_plugin.chris_plugin`, and used by `chris_plugin.PathMapper`.
+
+Outputs are stored as hard links when possible, so caching an output does not
+copy it. Consequently, output files must not be modified in-place after they
+have been written. When a cached output is used, the modification time of a
+separate marker file is updated (rather than that of the output, which would
+change every file hard linked to it) to keep track of which outputs were
+used recently.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from chris_plugin.helpers import copy_file
+
+CHUNK_SIZE = 16 * 1024 * 1024
+"""
+Large files are hashed in chunks of this many bytes concurrently.
+"""
+
+_EXCLUDED_OPTIONS = frozenset(
+    ("inputdir", "outputdir", "saveinputmeta", "saveoutputmeta")
+)
+
+
+def hash_file(path: Union[str, Path], workers: int = 4) -> str:
+    """
+    Compute a SHA-256 based digest of a file.
+
+    Files larger than `CHUNK_SIZE` are hashed in chunks by a pool of threads,
+    and the digest is the hash of the digests of the chunks. (`hashlib`
+    releases the GIL while hashing large buffers.)
+    """
+    size = os.stat(path).st_size
+    with open(path, "rb") as f:
+        if size <= CHUNK_SIZE:
+            return hashlib.sha256(f.read()).hexdigest()
+        fd = f.fileno()
+
+        def hash_chunk(offset: int) -> bytes:
+            return hashlib.sha256(os.pread(fd, CHUNK_SIZE, offset)).digest()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = pool.map(hash_chunk, range(0, size, CHUNK_SIZE))
+            return hashlib.sha256(b"".join(digests)).hexdigest()
+
+
+def namespace_of(version: str, options: argparse.Namespace) -> str:
+    """
+    Produce a digest identifying a version of a plugin and its options.
+    The data directories are not considered to be options.
+    """
+    params = {
+        k: v for k, v in sorted(vars(options).items()) if k not in _EXCLUDED_OPTIONS
+    }
+    serialized = json.dumps([version, params], sort_keys=True, default=repr)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    A directory of cached output files, evicted in least-recently-used order
+    when their total size exceeds `max_bytes`.
+
+    It is safe to use from multiple threads. Several processes may share the
+    same directory, in which case an output which is evicted by one process
+    while another is using it is treated as not cached.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        namespace: str,
+        max_bytes: int = 10 * 1024**3,
+    ):
+        """
+        Parameters
+        ----------
+        directory: str | Path
+            where to store cached outputs
+        namespace: str
+            identifies the plugin version and options, see `namespace_of`
+        max_bytes: int
+            size limit of the cache
+        """
+        self.directory = Path(directory)
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_size"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key_of(self, input_path: Path, output_name: str) -> str:
+        """
+        Compute the cache key of an input file.
+
+        :param output_name: path of the output relative to the output directory,
+                            so that inputs which are mapped to different outputs,
+                            e.g. by another `name_mapper`, have different keys
+        """
+        digest = hash_file(input_path)
+        data = f"{self.namespace}:{digest}:{output_name}"
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def key_or_none(self, input_path: Path, output_name: str) -> Optional[str]:
+        """
+        :return: the cache key of `input_path`, or `None` if it is not a regular file
+        """
+        return self.key_of(input_path, output_name) if input_path.is_file() else None
+
+    def _blob(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def fetch(
+        self, input_path: Path, output_path: Path, key: Optional[str] = None
+    ) -> bool:
+        """
+        If the output for `input_path` is cached, link it to `output_path`.
+
+        :param key: `key_of(input_path, output_name)`, if it is already known.
+                    Otherwise, the output is identified by its file name.
+        :return: True if the output was cached
+        """
+        if key is None:
+            key = self.key_or_none(input_path, output_path.name)
+            if key is None:
+                return False
+        blob = self._blob(key)
+        if not blob.is_file():
+            return False
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.exists():
+            output_path.unlink()
+        try:
+            copy_file(str(blob), str(output_path), hardlink=True)
+        except FileNotFoundError:  # evicted by another process
+            return False
+        _touch(_marker(blob))  # mark as recently used
+        return True
+
+    def store(
+        self,
+        input_path: Path,
+        output_path: Path,
+        key: Optional[str] = None,
+        account: bool = True,
+    ) -> int:
+        """
+        Cache `output_path` as the output of `input_path`. Nothing is stored if
+        `output_path` is not a regular file.
+
+        :param key: `key_of(input_path, output_name)`, if it is already known.
+                    Otherwise, the output is identified by its file name.
+        :param account: add the output to the size of the cache, evicting older
+                        outputs if needed. If `False`, the caller should pass the
+                        returned size to `account` instead, e.g. from the process
+                        which owns this cache when storing from another process.
+        :return: size of the stored output in bytes
+        """
+        if key is None:
+            key = self.key_or_none(input_path, output_path.name)
+        if key is None or not output_path.is_file():
+            return 0
+        blob = self._blob(key)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        copy_file(str(output_path), str(tmp), hardlink=True)
+        size = tmp.stat().st_size
+        os.replace(tmp, blob)
+        _touch(_marker(blob))
+        if account:
+            self.account(size)
+        return size
+
+    def account(self, n: int) -> None:
+        """
+        Add `n` bytes, which were stored with `account=False`, to the size of the cache.
+        """
+        if n:
+            self._add_size(n)
+
+    def _add_size(self, n: int) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(_size(p) for p in self._blobs())
+            else:
+                self._size += n
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _blobs(self):
+        return (
+            p
+            for p in self.directory.glob("*/*")
+            if not p.name.endswith((".tmp", _MARKER_SUFFIX))
+        )
+
+    def _evict(self, target: int) -> None:
+        """
+        Delete the least-recently used outputs until the cache is smaller than `target`.
+        Outputs which were linked into place are unaffected.
+        """
+        blobs = []
+        for p in self._blobs():
+            try:
+                size = p.stat().st_size
+            except FileNotFoundError:
+                continue
+            try:
+                used = _marker(p).stat().st_mtime_ns
+            except FileNotFoundError:
+                used = 0  # stored by an older version of chris_plugin
+            blobs.append((used, size, p))
+        blobs.sort()
+        self._size = sum(size for _, size, _ in blobs)
+        for _, size, p in blobs:
+            if self._size <= target:
+                break
+            for f in (p, _marker(p)):
+                try:
+                    f.unlink()
+                except FileNotFoundError:
+                    pass
+            self._size -= size
+
+
+_MARKER_SUFFIX = ".used"
+
+
+def _marker(blob: Path) -> Path:
+    return blob.with_name(blob.name + _MARKER_SUFFIX)
+
+
+def _size(blob: Path) -> int:
+    """
+    :return: the size of `blob`, or 0 if it was evicted by another process
+    """
+    try:
+        return blob.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        path.touch()
+
+
+def plugin_version(main: Callable) -> str:
+    """
+    Get the version of the Python distribution which provides the given
+    function. If it is not part of an installed distribution, a hash of the
+    source file of its module is used instead.
+    """
+    try:
+        from importlib.metadata import packages_distributions, version
+    except ImportError:
+        from importlib_metadata import packages_distributions, version
+
+    package = main.__module__.split(".")[0]
+    for dist in packages_distributions().get(package, []):
+        return f"{dist}=={version(dist)}"
+    module = sys.modules.get(main.__module__)
+    source = getattr(module, "__file__", None)
+    if source is None:
+        return "unknown"
+    return hash_file(source)
+
+
+_active: Optional[ResultCache] = None
+
+
+def get_active() -> Optional[ResultCache]:
+    """
+    :return: the cache configured by `@chris_plugin` for the running plugin
+    """
+    return _active
+
+
+def set_active(cache: Optional[ResultCache]) -> None:
+    global _active
+    _active = cache
@@ -45,6 +45,27 @@ def _check_is_dir(d: Path):
         sys.exit(1)
 
 
+def _plugin_parser(
+    parser: Optional[argparse.ArgumentParser], plugin_type: ChrisPluginType
+) -> argparse.ArgumentParser:
+    """
+    Add the positional arguments and flags required by *ChRIS* to `parser`,
+    which must be a copy of the one given to `chris_plugin`.
+    """
+    if parser is None:
+        parser = argparse.ArgumentParser()
+
+    # currently required by ChRIS
+    # https://github.com/FNNDSC/ChRIS_ultron_backEnd/blob/1cb155fa32571a5414cc9cd1cd4d4814ba5f1596/chris_backend/plugininstances/services/manager.py#L320
+    parser.add_argument("--saveinputmeta", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--saveoutputmeta", action="store_true", help=argparse.SUPPRESS)
+
+    if plugin_type != "fs":
+        parser.add_argument("inputdir", help="directory containing input files")
+    parser.add_argument("outputdir", help="directory containing output files")
+    return parser
+
+
 def chris_plugin(
     main: MainFunction = None,
     /,
@@ -63,6 +84,8 @@ def chris_plugin(
     min_gpu_limit: int = 0,
     max_gpu_limit: int = 0,
     singleton: bool = True,
+    result_cache: Optional[str] = None,
+    result_cache_max_bytes: int = 10 * 1024**3,
 ):
     """
     Creates a decorator which identifies a *ChRIS* plugin main function
@@ -177,7 +200,8 @@ def chris_plugin(
     title: str
         plugin title
     min_number_of_workers: int
-        number of workers for multi-node parallelism
+        number of workers for multi-node parallelism.
+        See `chris_plugin.PathMapper.shard` for dividing inputs between workers.
     max_number_of_workers: int
         worker request ceiling
     min_memory_limit: str
@@ -198,33 +222,33 @@ def chris_plugin(
         Indicates whether to register the given main function to a global mutable
         variable so that it can be located by the `chris_plugin_info` command.
         Used for internal testing, set `singleton=False`.
+    result_cache: str
+        Directory of a cache of output files, see `chris_plugin.cache`.
+        If given, `chris_plugin.PathMapper` skips input files which were
+        processed before by the same version of this plugin with the same
+        options, linking their cached outputs into place instead.
+    result_cache_max_bytes: int
+        Size limit of `result_cache`. Least-recently used outputs are
+        evicted when it is exceeded.
     """
 
     def wrap(main: MainFunction) -> Callable[[], T]:
-        nonlocal parser
-        if parser is None:
-            parser = argparse.ArgumentParser()
-        else:
-            parser = copy.deepcopy(parser)
-
-        # currently required by ChRIS
-        # https://github.com/FNNDSC/ChRIS_ultron_backEnd/blob/1cb155fa32571a5414cc9cd1cd4d4814ba5f1596/chris_backend/plugininstances/services/manager.py#L320
-        parser.add_argument(
-            "--saveinputmeta", action="store_true", help=argparse.SUPPRESS
-        )
-        parser.add_argument(
-            "--saveoutputmeta", action="store_true", help=argparse.SUPPRESS
-        )
-
         verified_type = _resolve_type(plugin_type, main)
-        if verified_type != "fs":
-            parser.add_argument("inputdir", help="directory containing input files")
-        parser.add_argument("outputdir", help="directory containing output files")
+
+        # The parser is copied now, so that later changes to it do not apply,
+        # but the arguments required by ChRIS are only added when it is needed,
+        # i.e. when the plugin is run from the command line or described by
+        # chris_plugin_info, not when main is called from Python.
+        copied = None if parser is None else copy.deepcopy(parser)
+
+        @functools.lru_cache(maxsize=None)
+        def get_parser() -> argparse.ArgumentParser:
+            return _plugin_parser(copied, verified_type)
 
         if singleton:
             register(
                 PluginDetails(
-                    parser=parser,
+                    get_parser=get_parser,
                     type=verified_type,
                     category=category,
                     icon=icon,
@@ -245,7 +269,7 @@ def chris_plugin(
             if args:
                 options, inputdir, outputdir = _call_from_python(args)
             else:
-                options, inputdir, outputdir = _call_from_cli(parser)
+                options, inputdir, outputdir = _call_from_cli(get_parser())
 
             if verified_type == "fs" and inputdir is not None:
                 raise ValueError(f"inputdir={inputdir} given to fs-type plugin")
@@ -261,7 +285,20 @@ def chris_plugin(
 
             input_path = Path(inputdir)
             _check_is_dir(input_path)
-            return main(options, input_path, output_path)
+            if result_cache is None:
+                return main(options, input_path, output_path)
+
+            from chris_plugin import cache
+
+            namespace = cache.namespace_of(cache.plugin_version(main), options)
+            previous = cache.get_active()
+            cache.set_active(
+                cache.ResultCache(result_cache, namespace, result_cache_max_bytes)
+            )
+            try:
+                return main(options, input_path, output_path)
+            finally:
+                cache.set_active(previous)
 
         return wrapper
 
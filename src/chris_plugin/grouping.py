@@ -0,0 +1,223 @@
+"""
+Mapping of groups of input files, such as the slices of a DICOM series or a
+NIFTI file and its JSON sidecar, to one output path per group.
+"""
+
+import os
+import re
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Union,
+)
+
+from chris_plugin._executor import ExecutorType, T, bounded_map
+from chris_plugin.limits import get_cpu_count
+from chris_plugin.mapper import PathMapper, _finish_after
+
+GroupKey = Callable[[str], Optional[str]]
+"""
+A function which takes the path of an input file relative to the input
+directory, and returns the key of its group, or `None` to leave it out.
+"""
+
+
+class Group(NamedTuple):
+    """
+    A group of input files yielded by `GroupMapper`.
+    """
+
+    key: str
+    """Key which the input files have in common"""
+    inputs: List[Path]
+    """Input files of the group, sorted by path"""
+    output: Path
+    """Output path of the group"""
+
+
+def by_directory(rel_path: str) -> Optional[str]:
+    """
+    Group input files by their parent directory, e.g. the slices of a DICOM series.
+    """
+    return os.path.dirname(rel_path) or "."
+
+
+def by_stem(suffixes: Sequence[str]) -> GroupKey:
+    """
+    Group input files which have the same path except for one of `suffixes`,
+    e.g. a NIFTI file and its JSON sidecar, using `by_stem([".nii.gz", ".json"])`.
+    Input files which do not end with any of `suffixes` are left out.
+    """
+    ordered = sorted(suffixes, key=len, reverse=True)  # .nii.gz before .gz
+
+    def key(rel_path: str) -> Optional[str]:
+        for suffix in ordered:
+            if rel_path.endswith(suffix):
+                return rel_path[: -len(suffix)]
+        return None
+
+    return key
+
+
+def by_pattern(pattern: Union[str, Pattern]) -> GroupKey:
+    """
+    Group input files by a part of their relative paths: the first group
+    of a regular expression, e.g. `by_pattern(r"(.*)_slice\\d+\\.dcm")`.
+    Input files which do not match are left out.
+    """
+    regex = re.compile(pattern)
+
+    def key(rel_path: str) -> Optional[str]:
+        match = regex.fullmatch(rel_path)
+        if match is None:
+            return None
+        return match.group(1)
+
+    return key
+
+
+def _verbatim(key: str, output_dir: Path) -> Path:
+    return output_dir / key
+
+
+@dataclass(frozen=True)
+class GroupMapper(Iterable[Group]):
+    """
+    Discovers input files in the same way as a `PathMapper`, groups them
+    by a key, and maps each group to an output path.
+
+    The input directory is read once. Input files are indexed by key in a
+    dictionary, so grouping takes time linear in the number of inputs.
+
+    Examples
+    --------
+
+    Convert each DICOM series to a NIFTI file:
+
+    ```python
+    mapper = PathMapper.file_mapper(input_dir, output_dir, glob='**/*.dcm')
+    for series, slices, output_dir in GroupMapper(mapper):
+        dicom2nifti(slices, output_dir.with_suffix('.nii'))
+    ```
+
+    Process NIFTI files together with their sidecars, in parallel:
+
+    ```python
+    mapper = PathMapper.file_mapper(input_dir, output_dir, glob=['**/*.nii.gz', '**/*.json'])
+    groups = GroupMapper(mapper, key=by_stem(['.nii.gz', '.json']))
+    for _ in groups.map(process_scan, workers=4):
+        pass
+    ```
+    """
+
+    mapper: PathMapper
+    """
+    Finds the input files. Its `globs`, `filter`, `exclude`, `kind`, `order`,
+    `shard`, `fail_if_empty`, etc. are used, its `output_dir`, `parents` and
+    `durability` apply to groups, and `mirror` copies the files which are not
+    inputs of `mapper`. Its `name_mapper`, `prefetch`, and the active
+    result cache are not used.
+
+    Options which work on individual inputs, namely `journal`, `claims`,
+    `stats`, and a `result_cache` given as a `ResultCache`, are not supported.
+    """
+
+    key: GroupKey = by_directory
+    """
+    Computes the key of the group of an input file. See `by_directory`,
+    `by_stem`, and `by_pattern`.
+    """
+
+    name_mapper: Callable[[str, Path], Path] = _verbatim
+    """
+    Produces the output path of a group, given its key and the output directory.
+    By default, the output path is the key relative to the output directory.
+    """
+
+    def __post_init__(self):
+        mapper = self.mapper
+        for option in ("journal", "claims", "stats"):
+            if getattr(mapper, option) is not None:
+                raise ValueError(f"{option} is not supported by GroupMapper")
+        if not isinstance(mapper.result_cache, bool):
+            raise ValueError("result_cache is not supported by GroupMapper")
+
+    def groups(self) -> Dict[str, List[str]]:
+        """
+        :return: paths of input files, by group key, in the order
+                 in which groups were first found
+        """
+        mapper = self.mapper
+        key = self.key
+        index: Dict[str, List[str]] = {}
+        for path, _ in mapper._iter_found_or_exit():
+            k = key(mapper._relative(path))
+            if k is None:
+                continue
+            members = index.get(k)
+            if members is None:
+                index[k] = [path]
+            else:
+                members.append(path)
+        return index
+
+    def __iter__(self) -> Iterator[Group]:
+        return _finish_after(self._iter_groups(), self.mapper)
+
+    def _iter_groups(self) -> Iterator[Group]:
+        mapper = self.mapper
+        mapper._start_mirror()
+        for k, members in self.groups().items():
+            output_path = self.name_mapper(k, mapper.output_dir)
+            if mapper.parents is True:
+                mapper.ensure_parent(output_path)
+            yield Group(k, [Path(p) for p in sorted(members)], output_path)
+
+    def map(
+        self,
+        fn: Callable[[str, List[Path], Path], T],
+        workers: Optional[int] = None,
+        executor: Union[ExecutorType, Executor] = "thread",
+        ordered: bool = True,
+        fail_fast: bool = True,
+        max_pending: Optional[int] = None,
+    ) -> Iterator[T]:
+        """
+        Call `fn(key, inputs, output_path)` for every group in parallel,
+        yielding the return values of `fn`. See `PathMapper.map` for details.
+        """
+        if workers is None:
+            workers = get_cpu_count()
+        results = bounded_map(
+            _GroupCall(fn),
+            ((group, group.output) for group in self._iter_groups()),
+            executor=executor,
+            workers=workers,
+            max_pending=(2 * workers if max_pending is None else max_pending),
+            ordered=ordered,
+            fail_fast=fail_fast,
+        )
+        return _finish_after(results, self.mapper)
+
+
+class _GroupCall:
+    """
+    Adapts a function of a group to the calling convention of `bounded_map`.
+    It is picklable if the function is.
+    """
+
+    def __init__(self, fn: Callable[[str, List[Path], Path], T]):
+        self.fn = fn
+
+    def __call__(self, group: Group, output_path: Path) -> T:
+        return self.fn(group.key, group.inputs, output_path)
@@ -1,8 +1,29 @@
 """
 General helper functions which might be useful for *ChRIS* plugins.
 """
+import errno
+import mmap
+import os
+import shutil
 import sys
-from typing import Tuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Literal, Optional, Sequence, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+CopyMethod = Literal["hardlink", "reflink", "copy_file_range", "sendfile", "buffered"]
+"""
+How `copy_file` copied a file.
+"""
+
+_FICLONE = 0x40049409
+_UNSUPPORTED = frozenset(
+    (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY)
+)
 
 
 def parse_csv_as_dict(s: str):
@@ -37,3 +58,175 @@ def parse_csv_as_dict(s: str):
 def __split_on_colon(s: str) -> Tuple[str, str]:
     a, b = s.split(':', maxsplit=1)
     return a, b
+
+
+def copy_file(
+    src: Union[str, Path], dst: Union[str, Path], hardlink: bool = False
+) -> CopyMethod:
+    """
+    Copy the contents of the file `src` to `dst`, like `shutil.copyfile`,
+    using the cheapest method which works:
+
+    1. `"hardlink"`: make `dst` a hard link to `src`, if they are on the same
+       filesystem and `hardlink=True`. No data is copied, but `dst` is the same
+       file as `src`, so neither may be modified in-place afterwards. Only
+       pass `hardlink=True` if that is the case.
+    2. `"reflink"`: clone the data of `src` (`FICLONE`), on filesystems such as
+       Btrfs and XFS. Data is shared until either file is modified.
+    3. `"copy_file_range"` or `"sendfile"`: copy data within the kernel,
+       without passing it through user space. (Linux only)
+    4. `"buffered"`: read and write the data in user space.
+
+    `dst` is overwritten if it exists, unless it can be linked to.
+
+    Examples
+    --------
+
+    ```python
+    from collections import Counter
+    from chris_plugin import PathMapper
+    from chris_plugin.helpers import copy_file
+
+    methods = Counter(
+        copy_file(input_file, output_file)
+        for input_file, output_file in PathMapper.file_mapper(input_dir, output_dir)
+    )
+    print(methods)  # e.g. Counter({'reflink': 1024})
+    ```
+
+    :return: the method used
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if _reflink(fsrc.fileno(), fdst.fileno()):
+            return "reflink"
+        size = os.fstat(fsrc.fileno()).st_size
+        if size == 0:  # empty, or its size is unknown (e.g. procfs)
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+            return "buffered"
+        if hasattr(os, "copy_file_range") and _copy_in_kernel(
+            os.copy_file_range, fsrc.fileno(), fdst.fileno(), size
+        ):
+            return "copy_file_range"
+        if sys.platform.startswith("linux") and _copy_in_kernel(
+            _sendfile, fsrc.fileno(), fdst.fileno(), size
+        ):
+            return "sendfile"
+        shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+        return "buffered"
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return False
+        raise
+
+
+def _sendfile(src_fd: int, dst_fd: int, count: int, offset: int, _) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _copy_in_kernel(copy, src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Copy using `os.copy_file_range` or `os.sendfile`.
+
+    :return: False if the method is not supported and nothing was copied
+    """
+    offset = 0
+    while offset < size:
+        try:
+            n = copy(src_fd, dst_fd, 1 << 30, offset, offset)
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if n == 0:  # the file shrank
+            break
+        offset += n
+    os.ftruncate(dst_fd, offset)
+    return True
+
+
+@contextmanager
+def mmap_file(
+    path: Union[str, Path],
+    dtype=None,
+    offset: int = 0,
+    shape: Optional[Sequence[int]] = None,
+) -> Iterator[Union[memoryview, "numpy.ndarray"]]:
+    """
+    Map a file into memory, read-only.
+
+    Reading the file does not copy its contents into the memory of the Python
+    process: its pages are read from disk when first accessed, and are shared
+    with the page cache (and so with other processes reading the same file).
+    This keeps peak memory usage low when processing large files.
+
+    The mapping is closed when the context exits. Views of it must not be
+    used afterwards. (If any are still referenced, the mapping is closed
+    when they are garbage-collected instead.)
+
+    Examples
+    --------
+
+    ```python
+    with mmap_file(input_file) as data:
+        header = bytes(data[:352])
+    ```
+
+    With [NumPy](https://numpy.org/), e.g. to read a raw volume of 32-bit floats:
+
+    ```python
+    with mmap_file(input_file, dtype='<f4', offset=352, shape=(256, 256, 256)) as volume:
+        np.save(output_file, volume.mean(axis=0))
+    ```
+
+    Parameters
+    ----------
+    path: str | Path
+        file to map
+    dtype: numpy.dtype
+        If given, a read-only `numpy.ndarray` of this type is produced.
+        Otherwise, a `memoryview` of bytes.
+    offset: int
+        number of bytes at the start of the file to skip
+    shape: Sequence[int]
+        shape of the array, if `dtype` is given
+    """
+    with open(path, "rb") as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # cannot map an empty file
+            m = None
+    view = memoryview(m if m is not None else b"")[offset:]
+    data = view
+    if dtype is not None:
+        import numpy
+
+        count = -1 if shape is None else int(numpy.prod(shape))
+        data = numpy.frombuffer(view, dtype=dtype, count=count)
+        if shape is not None:
+            data = data.reshape(shape)
+    try:
+        yield data
+    finally:
+        del data
+        try:
+            view.release()
+            if m is not None:
+                m.close()
+        except BufferError:
+            pass  # still referenced outside of the context
@@ -7,9 +7,11 @@ this process is running in.
 
 import os
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 
 __CGROUP_MEMORY_LIMIT_FILE = Path("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+__CGROUP2_MEMORY_MAX_FILE = Path("/sys/fs/cgroup/memory.max")
+__UNLIMITED = 2**62  # cgroup v1 reports "no limit" as a huge number
 
 
 def _linux_only(f: Callable) -> Callable:
@@ -22,21 +24,31 @@ def _linux_only(f: Callable) -> Callable:
 def get_cpu_count() -> int:
     """
     Number of CPUs visible to the container this process is running in.
+
+    On platforms without `os.sched_getaffinity` (macOS, Windows), this is
+    the number of CPUs in the system, or 1 if it is unknown.
     """
-    return len(os.sched_getaffinity(0))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 
-def get_memory_limit() -> int:
+def get_memory_limit() -> Optional[int]:
     """
+    Supports cgroup v2 and cgroup v1.
 
     Returns
     -------
 
-    Memory limit in bytes.
+    Memory limit in bytes, or `None` if there is no limit or it is unknown.
     """
-
     try:
-        t = __CGROUP_MEMORY_LIMIT_FILE.read_text()
-        return int(t)
-    except FileNotFoundError:
-        ...
+        t = __CGROUP2_MEMORY_MAX_FILE.read_text().strip()
+        return None if t == "max" else int(t)
+    except (FileNotFoundError, ValueError):
+        pass
+    try:
+        limit = int(__CGROUP_MEMORY_LIMIT_FILE.read_text())
+        return None if limit >= __UNLIMITED else limit
+    except (FileNotFoundError, ValueError):
+        return None
@@ -1,9 +1,49 @@
+import functools
+import itertools
+import os
 import sys
+import time
 from pathlib import Path
-from typing import Callable, Iterable, Iterator, Tuple, Optional, Sequence, Union
-from dataclasses import dataclass, field
+from re import Pattern
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    IO,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Set,
+    Tuple,
+    TypeVar,
+    Optional,
+    Sequence,
+    Union,
+)
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+# Modules which are only needed by some features are imported when those
+# features are used, so that importing PathMapper is fast.
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from chris_plugin._atomic import Durability, PendingSync
+    from chris_plugin._entry import PathEntry
+    from chris_plugin._executor import ExecutorType
+    from chris_plugin._inodes import InodeSet
+    from chris_plugin._order import OrderName, SortKey
+    from chris_plugin._plan import Plan
+    from chris_plugin._claim import ClaimQueue
+    from chris_plugin._journal import Journal
+    from chris_plugin._mirror import Mirror
+    from chris_plugin._stats import Stats, Timed
+    from chris_plugin.cache import ResultCache
+    from chris_plugin._walk import Entry, PathKind
 
 NameMapper = Callable[[Path, Path], Path]
+T = TypeVar("T")
 
 
 # Private Helpers
@@ -25,6 +65,190 @@ def _curry_suffix(suffix: str) -> NameMapper:
     return append_suffix
 
 
+class _Snapshot:
+    """
+    A compact recording of input paths.
+
+    Each distinct parent directory is stored once. An input path is stored
+    as its final component and the index of its parent directory.
+    """
+
+    __slots__ = ("_dirs", "_dir_index", "_parents", "_names")
+
+    def __init__(self):
+        from array import array
+
+        self._dirs: List[str] = []
+        self._dir_index: Optional[Dict[str, int]] = {}
+        self._parents = array("L")
+        self._names: List[str] = []
+
+    def append(self, path: str) -> None:
+        parent, name = os.path.split(path)
+        i = self._dir_index.get(parent)
+        if i is None:
+            i = self._dir_index[parent] = len(self._dirs)
+            self._dirs.append(parent)
+        self._parents.append(i)
+        self._names.append(name)
+
+    def seal(self) -> "_Snapshot":
+        """
+        Discard the lookup table which is only needed while recording.
+        """
+        self._dir_index = None
+        return self
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __iter__(self) -> Iterator[str]:
+        dirs = self._dirs
+        for i, name in zip(self._parents, self._names):
+            yield os.path.join(dirs[i], name)
+
+
+class _CacheResult(NamedTuple):
+    value: object
+    hit: bool
+    stored_bytes: int
+
+
+class _CachedCall:
+    """
+    Wraps a function of an input and output path to look up the output in a
+    result cache before calling it, and store the output afterwards. Hashing the
+    input happens in the worker calling this, so it is done in parallel.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[Path, Path], T],
+        result_cache: "ResultCache",
+        output_dir: Path,
+    ):
+        self.fn = fn
+        self.result_cache = result_cache
+        self.output_dir = output_dir
+
+    def __call__(self, input_path: Path, output_path: Path) -> _CacheResult:
+        output_name = os.path.relpath(output_path, self.output_dir)
+        key = self.result_cache.key_or_none(input_path, output_name)
+        if key is not None and self.result_cache.fetch(input_path, output_path, key):
+            return _CacheResult(None, True, 0)
+        value = self.fn(input_path, output_path)
+        stored = self.result_cache.store(input_path, output_path, key, account=False)
+        return _CacheResult(value, False, stored)
+
+
+def _unwrap_cached(
+    results: Iterator[_CacheResult], result_cache: "ResultCache"
+) -> Iterator[T]:
+    for result in results:
+        if not result.hit:
+            result_cache.account(result.stored_bytes)
+            yield result.value
+
+
+def _input_size(path: Union[str, Path], entry: Optional["Entry"]) -> int:
+    """
+    Get the size of an input file, preferably from the `stat` cached by `os.DirEntry`.
+    """
+    try:
+        return (os.stat(path) if entry is None else entry.stat()).st_size
+    except OSError:
+        return 0
+
+
+def _tree_size(directory: str) -> int:
+    """
+    Get the total size of the files under a directory, without following symbolic links.
+    """
+    total = 0
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def _shard_size(path: str, entry: Optional["Entry"]) -> int:
+    """
+    Get the size of an input file, or the total size of an input directory's files.
+    """
+    is_dir = entry.is_dir() if entry is not None else os.path.isdir(path)
+    return _tree_size(path) if is_dir else _input_size(path, entry)
+
+
+def _unique(
+    found: Iterable[Tuple[str, "Entry"]], seen: "InodeSet"
+) -> Iterator[Tuple[str, "Entry"]]:
+    """
+    Skip entries which are the same file as an entry which came before.
+    """
+    for path, entry in found:
+        try:
+            st = entry.stat()
+        except OSError:  # broken symbolic link
+            yield path, entry
+            continue
+        if seen.add(st.st_dev, st.st_ino):
+            yield path, entry
+
+
+def _timestamp(
+    found: Iterator[Tuple[Path, Path, Optional["Entry"]]],
+    submitted: Dict[Path, Tuple[float, int]],
+) -> Iterator[Tuple[Path, Path]]:
+    """
+    Record when each pair is taken from `found`, and the size of its input.
+    """
+    for input_path, output_path, entry in found:
+        submitted[input_path] = (time.monotonic(), _input_size(input_path, entry))
+        yield input_path, output_path
+
+
+def _finish_after(results: Iterator[T], mapper: "PathMapper") -> Iterator[T]:
+    try:
+        yield from results
+    finally:
+        mapper._finish()
+
+
+class _MapperCache:
+    """
+    Mutable state belonging to an otherwise frozen `PathMapper`.
+    """
+
+    def __init__(self):
+        import threading
+
+        self.lock = threading.Lock()
+        self.snapshot: Optional[_Snapshot] = None
+        self.snapshot_overflow = False
+        self.mkdir_lock = threading.Lock()
+        self.created_dirs: Set[str] = set()
+        self.journal: Optional["Journal"] = None
+        self.claims: Optional["ClaimQueue"] = None
+        self.exhausted = False
+        self.prefix: Optional[str] = None
+        self.mirror: Optional["Mirror"] = None
+        self.pending_sync: Optional["PendingSync"] = None
+        self.stats: Optional["Stats"] = None
+        self.unpickled = False
+        self.result_keys: Dict[str, Optional[str]] = {}
+
+
 def curry_name_mapper(output_template: str) -> Callable[[Path, Path], Path]:
     """
     A helper function which creates a function that is a suitable value for
@@ -117,34 +341,24 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
 
     Examples in this section are advanced tips and tricks.
 
-    Use [ThreadPoolExecutor](https://docs.python.org/3/library/concurrent.futures.html#threadpoolexecutor)
-    to parallelize subprocesses (akin to the usage of GNU
-    [parallel](https://www.gnu.org/software/parallel/)):
+    Use `PathMapper.map` to call a function over all inputs in parallel,
+    e.g. to run subprocesses akin to GNU [parallel](https://www.gnu.org/software/parallel/):
 
     ```python
     from pathlib import Path
     import subprocess as sp
-    from concurrent.futures import ThreadPoolExecutor
-
-    # example: submit tasks one-by-one
-    with ThreadPoolExecutor(max_workers=4) as pool:
-        for input_file, output_path in PathMapper(input_dir, output_dir):
-            pool.submit(sp.run, ['external_command', input_file, output_path])
 
-    # example: call a function over all inputs
     def do_something(input_file: Path, output_file: Path) -> None:
-        ...
+        sp.run(['external_command', input_file, output_file], check=True)
 
-    with ThreadPoolExecutor(max_workers=4) as pool:
-        results = pool.map(lambda t: do_something(*t), PathMapper(input_dir, output_dir))
-
-    # iterate over results to raise any Exceptions which occurred in threads
-    for _ in results:
+    # results are computed as they are iterated over, and any exception
+    # raised by do_something is raised here.
+    for _ in PathMapper(input_dir, output_dir).map(do_something, workers=4):
         pass
     ```
 
-    Hint: `os.sched_getaffinity(0)` gets the number of visible CPUs
-    (which can be limited by, for instance, `docker run --cpuset-cpus 0-3`)
+    By default, the number of workers is the number of visible CPUs
+    (which can be limited by, for instance, `docker run --cpuset-cpus 0-3`).
 
     Add a progress bar with [tqdm](https://github.com/tqdm/tqdm):
 
@@ -154,6 +368,11 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
     with tqdm(PathMapper(input_dir, output_dir)) as bar:
         for input_file, output_path in bar:
             do_something(input_file, output_path)
+
+    # or, in parallel
+    mapper = PathMapper(input_dir, output_dir)
+    for _ in tqdm(mapper.map(do_something), total=len(mapper)):
+        pass
     ```
 
     For some examples on how to use `tqdm`, `PathMapper`, and a thread or process pool, see these examples:
@@ -176,11 +395,20 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
     globs: Sequence[str] = field(default_factory=lambda: ["**/*"])
     """
     File name patterns matching input files in `input_dir`.
+    All patterns are matched during a single traversal of `input_dir`, and a
+    path which matches several patterns is included once.
     """
 
-    parents: bool = True
+    parents: Union[bool, Literal["lazy"]] = True
     """
-    If `True`, create parent directories of output paths as needed.
+    If `True`, create parent directories of output paths as needed during
+    iteration. Each directory is created once, no matter how many output
+    paths it contains.
+
+    If `"lazy"`, parent directories are not created during iteration. Instead,
+    they are created by `ensure_parent` or `open_output` when an output file is
+    first written to, so inputs which end up being skipped do not leave behind
+    empty directories.
     """
 
     fail_if_empty: bool = True
@@ -193,15 +421,315 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
     Decides whether a given subpath of input directory should be in the input space.
     """
 
+    kind: Optional["PathKind"] = None
+    """
+    If specified, only include input paths which are of this type: `"file"`,
+    `"dir"`, or `"leaf"` (a directory which does not contain subdirectories).
+    Unlike checking `Path.is_file` in `filter`, this check reuses the file type
+    information obtained while reading the directory, so it does not cost an
+    extra `stat` per path.
+    """
+
+    snapshot: bool = False
+    """
+    If `True`, the input paths found by the first traversal of `input_dir` are
+    recorded. Afterwards, `count`, `is_empty`, and iteration read the recording
+    instead of traversing `input_dir` again. Call `refresh` to discard the
+    recording after the contents of `input_dir` have changed.
+
+    Each distinct directory is stored once, and each input path is stored as its
+    file name plus an integer, which costs about 60 bytes plus the length of the
+    file name per input path (roughly 100MB per million paths).
+    """
+
+    snapshot_limit: int = 1_000_000
+    """
+    Maximum number of input paths to record when `snapshot=True`. If `input_dir`
+    contains more, the recording is abandoned and `input_dir` is traversed on
+    every call, as if `snapshot=False`.
+    """
+
+    order: Union[None, "OrderName", "SortKey"] = None
+    """
+    Order in which to yield input paths. If `None`, they are yielded in the
+    order they are found. Otherwise, all input paths are found before the
+    first one is yielded, then they are sorted by one of these strategies:
+
+    - `"largest-first"`: biggest files first. When inputs are processed by a
+      pool of workers (e.g. `PathMapper.map`), this reduces the time until the
+      last worker finishes, because big inputs are not left until the end.
+    - `"inode"`: ascending inode number, which roughly follows the placement
+      of files on disk, making reads more sequential on spinning disks.
+    - `"directory"`: files of the same directory together, in ascending inode
+      number within each directory.
+
+    A function which takes an `os.DirEntry` and returns a sort key can also
+    be given. Only `"largest-first"` needs to `stat` the input paths.
+    """
+
+    journal: Optional[str] = None
+    """
+    File name, relative to `output_dir`, of a journal which records the pairs
+    that were processed completely, making it possible to resume an interrupted
+    run. When the journal already exists, pairs which it records as completed
+    are skipped, unless the size or modification time of their input changed.
+
+    A pair is considered complete when the body of the `for` loop over this
+    `PathMapper` finishes, or when the function given to `PathMapper.map`
+    returns without raising an exception. Completions are written to the
+    journal in batches.
+
+    Note that `count` and `is_empty` do not take the journal into account.
+    """
+
+    claims: Optional[str] = None
+    """
+    Directory, relative to `output_dir` or absolute, of a queue shared by several
+    processes (e.g. the workers of a plugin with `max_number_of_workers > 1`,
+    or several containers on different hosts) which have the same `input_dir`
+    and `output_dir`. Each input is processed by the first process to claim it,
+    so processes which are faster, or which got quicker inputs, do more work.
+    Unlike `shard`, this does not depend on inputs taking time proportional
+    to their size.
+
+    An input is claimed by atomically creating a lease file in the directory,
+    which is renewed every third of `claim_lease` seconds while the input is
+    being processed. If a process crashes, its leases expire and the inputs
+    are claimed by other processes. The shared filesystem must support
+    exclusive file creation (`O_EXCL`), e.g. any local filesystem or NFSv3+.
+
+    An input is done when it is completed (see `journal`). If processing fails,
+    its lease is released and it may be claimed again by another process.
+    Done inputs are remembered by marker files in the directory, so a process
+    which starts later skips them. The directory is kept, unless
+    `claim_cleanup=True`. To avoid uploading it with the outputs, give a
+    directory outside of `output_dir`.
+    """
+
+    claim_lease: float = 60.0
+    """
+    Seconds without renewal after which a lease of `claims` expires.
+    """
+
+    claim_cleanup: bool = False
+    """
+    If `True`, the directory of `claims` is removed by the last process to
+    finish, if every input is done. Every process must start using the queue
+    before the first one finishes: a process which starts after the directory
+    is removed processes every input again. To skip inputs which are done in
+    that case, also use `journal`.
+    """
+
+    result_cache: Union[bool, "ResultCache"] = True
+    """
+    If `True`, use the cache of output files configured by the `result_cache`
+    parameter of `@chris_plugin`, if any. Input files found in the cache are
+    skipped, and their cached outputs are linked into place. Outputs are added
+    to the cache when they are completed (see `journal`). `False` disables
+    caching. A `chris_plugin.cache.ResultCache` can also be given directly.
+    """
+
+    walk_threads: Optional[int] = 1
+    """
+    Number of threads which read the directories of `input_dir` concurrently.
+    If `None`, use the number of CPUs available (`chris_plugin.limits.get_cpu_count`).
+
+    More than one thread helps when `input_dir` is on a filesystem with high
+    latency, such as NFS or CephFS, where reading each directory is a slow
+    round-trip.
+    """
+
+    walk_ordered: bool = True
+    """
+    Only relevant when `walk_threads` is not 1. If `True`, input paths are yielded
+    in the same order as they would be by a single thread. If `False`, they are
+    yielded as soon as their directory is read, which is faster.
+    """
+
+    shard: Union[None, Literal["auto"], Tuple[int, int]] = None
+    """
+    Divide the inputs between replicas of a plugin running in parallel, e.g. the
+    workers of a plugin with `max_number_of_workers > 1`, so that each replica
+    only processes its share. Given a tuple `(rank, number_of_replicas)`, this
+    `PathMapper` yields the share of replica `rank` (counting from 0).
+
+    If `"auto"`, the rank and number of replicas are taken from environment
+    variables set by common launchers and schedulers:
+
+    - `CHRIS_PLUGIN_RANK` and `CHRIS_PLUGIN_WORLD_SIZE`
+    - `RANK` and `WORLD_SIZE` (e.g. torchrun)
+    - `JOB_COMPLETION_INDEX` and `WORLD_SIZE` (Kubernetes indexed Job)
+    - `SLURM_PROCID` and `SLURM_NTASKS`
+    - `OMPI_COMM_WORLD_RANK` and `OMPI_COMM_WORLD_SIZE` (Open MPI)
+    - `PMI_RANK` and `PMI_SIZE` (MPICH)
+
+    If none are set, there is a single replica which processes everything.
+
+    Inputs are divided by the sizes of files rather than their number, so that
+    every replica has about the same amount of data to process. The size of an
+    input directory (e.g. with `dir_mapper_deep`) is the total size of the files
+    under it, which costs reading its contents. Every replica must see the same
+    inputs, and all inputs are found before the first one is yielded.
+    """
+
+    exclude: Sequence[Union[str, Pattern]] = ()
+    """
+    Glob patterns (as in `globs`) or compiled regular expressions of paths to
+    leave out of the input space. Regular expressions are matched against the
+    whole path relative to `input_dir`, e.g. `re.compile(r".*/scratch_[0-9]+")`.
+
+    Unlike `filter`, directories which are excluded are not read at all.
+    For example, `exclude=["**/.*"]` skips hidden files and directories,
+    and `exclude=["**/.git/"]` skips git repositories' metadata.
+    """
+
+    follow_symlinks: bool = False
+    """
+    If `True`, `**` in `globs` descends into symbolic links to directories.
+    Links which lead to a directory containing themselves are not followed,
+    so cycles of links do not cause an endless traversal. By default, like
+    `pathlib.Path.glob`, symbolic links to directories are only followed when
+    they match a pattern component other than `**`.
+    """
+
+    dedupe: bool = False
+    """
+    If `True`, an input file (or directory) reachable by several paths, e.g.
+    through symbolic links (see `follow_symlinks`) or hard links, is only
+    included the first time it is found. Files are identified by device and
+    inode number, which costs one `stat` per input path. Identities are kept
+    in a compact set which uses less than 24 bytes per input.
+    """
+
+    mirror: bool = False
+    """
+    If `True`, files under `input_dir` which are not inputs of this `PathMapper`
+    (because they do not match `globs` or `filter`) are copied to the same
+    relative path under `output_dir`, so that the output directory has the
+    whole input tree, e.g. for downstream plugins. Paths matching `exclude` are
+    not copied, and existing output files are not overwritten.
+
+    A file is not copied to the output path of an input, e.g. `scan.txt` is
+    not copied if `scan.nii` is an input and `suffix=".txt"`.
+
+    Copying happens in a background thread while inputs are processed, using
+    reflinks when possible (see `chris_plugin.helpers.copy_file`).
+    When iteration over this `PathMapper` ends, it waits for copying to finish.
+    Only `kind="file"` is supported. If `shard` is used, only the replica of
+    rank 0 copies files.
+    """
+
+    mirror_hardlink: bool = False
+    """
+    If `True`, files copied by `mirror` are hard links to the input files when
+    possible, which is faster but means that modifying one of those output
+    files in-place also modifies the input file.
+    """
+
+    prefetch: int = 0
+    """
+    Number of upcoming input files to read ahead in the background while
+    the current one is processed, which hides the latency of slow storage.
+    Files are prefetched into the page cache of the kernel, using
+    `posix_fadvise(POSIX_FADV_WILLNEED)` where available.
+    """
+
+    prefetch_bytes: Optional[int] = None
+    """
+    Maximum number of bytes of the current and upcoming input files to prefetch.
+    If `None`, it is 256 MiB or an eighth of the memory limit of the container
+    (see `chris_plugin.limits.get_memory_limit`), whichever is less.
+    """
+
+    durability: "Durability" = "batch"
+    """
+    When outputs written by `atomic_path` or `atomic_open` are flushed to
+    stable storage with `fsync`:
+
+    - `"none"`: never, it is left to the operating system. Outputs are still
+      all-or-nothing, but could be lost if the machine crashes.
+    - `"batch"`: all together (concurrently) when iteration ends, see `sync`.
+    - `"file"`: each output, before and after it is renamed into place. It is
+      the safest option, but the slowest, especially on network storage.
+
+    A `PathMapper` which was pickled, e.g. to call `atomic_path` in a worker of
+    `PathMapper.map` with `executor="process"`, cannot batch outputs with the
+    original, so it uses `"file"` instead of `"batch"`.
+    """
+
+    stats: Optional[str] = None
+    """
+    File name, relative to `output_dir` (or an absolute path), of a report on
+    the time spent on each input, written as JSON when iteration ends. For each
+    pair, the time waited before processing (e.g. for inputs to be found, or
+    for a worker of `PathMapper.map` to be free) and the time spent processing
+    it are measured, as well as the sizes of input and output files.
+
+    The report has percentiles of those measurements, a histogram of processing
+    times, the number of files and bytes processed per second, and the
+    `stats_slowest` inputs which took the longest to process.
+
+    For a `for` loop over this `PathMapper`, processing time is the time
+    spent in the body of the loop.
+    """
+
+    stats_slowest: int = 10
+    """
+    Number of slowest inputs to list in the report of `stats`.
+    """
+
+    _cache: _MapperCache = field(
+        default_factory=_MapperCache, init=False, repr=False, compare=False
+    )
+
     def __post_init__(self):
         if isinstance(self.globs, str):
             raise TypeError(
                 f"globs must not be a plain str. Use list[str] or tuple[str] instead."
             )
+        if isinstance(self.exclude, str):
+            raise TypeError(
+                f"exclude must not be a plain str. Use list[str] or tuple[str] instead."
+            )
         if not self.input_dir.is_dir():
             raise ValueError(f"Not a directory: {self.input_dir}")
-        if not self.output_dir.is_dir() and self.output_dir.exists():
+        if self.output_dir.exists() and not self.output_dir.is_dir():
             raise ValueError(f"Not a directory: {self.output_dir}")
+        if isinstance(self.order, str):
+            from chris_plugin._order import ORDERS
+
+            if self.order not in ORDERS:
+                raise ValueError(f"order must be one of {list(ORDERS)}: {self.order}")
+        if self.walk_threads is not None and self.walk_threads < 1:
+            raise ValueError(f"walk_threads must be at least 1: {self.walk_threads}")
+        if self.durability != "batch":
+            from chris_plugin._atomic import DURABILITIES
+
+            if self.durability not in DURABILITIES:
+                raise ValueError(
+                    f"durability must be one of {list(DURABILITIES)}: {self.durability}"
+                )
+        if self.prefetch < 0:
+            raise ValueError(f"prefetch must not be negative: {self.prefetch}")
+        if self.mirror and self.kind != "file":
+            raise ValueError('mirror is only supported with kind="file"')
+        if self.claim_lease <= 0:
+            raise ValueError(f"claim_lease must be positive: {self.claim_lease}")
+        if self.shard is not None and self.shard != "auto":
+            from chris_plugin._shard import check_rank
+
+            check_rank(*self.shard)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_cache"]  # locks cannot be pickled
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        cache = _MapperCache()
+        cache.unpickled = True
+        object.__setattr__(self, "_cache", cache)
 
     @classmethod
     def file_mapper(
@@ -213,6 +741,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         suffix: Optional[str] = None,
         fail_if_empty: bool = True,
         filter: Callable[[Path], bool] = _include_all,
+        exclude: Sequence[Union[str, Pattern]] = (),
+        **kwargs,
     ) -> "PathMapper":
         """
         Constructor for `PathMapper` for working with files.
@@ -263,7 +793,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
             File name patterns matching input files in `input_dir`.
             Either one or more values can be given.
 
-        See field documentation for other arguments.
+        See field documentation for other arguments. Any other field, e.g.
+        `journal` or `mirror`, can also be given.
         """
         if suffix is not None:
             if name_mapper is not _verbatim:
@@ -278,7 +809,10 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
             globs=globs,
             name_mapper=name_mapper,
             fail_if_empty=fail_if_empty,
-            filter=lambda p: p.is_file() and filter(p),
+            filter=filter,
+            exclude=exclude,
+            kind="file",
+            **kwargs,
         )
 
     @classmethod
@@ -289,6 +823,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         name_mapper: NameMapper = _verbatim,
         fail_if_empty: bool = True,
         filter: Callable[[Path], bool] = _include_all,
+        exclude: Sequence[Union[str, Pattern]] = (),
+        **kwargs,
     ) -> "PathMapper":
         """
         Constructor for `PathMapper` for working with immediate subdirectories of `input_dir`.
@@ -299,7 +835,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         Parameters
         ----------
 
-        See field documentation.
+        See field documentation. Any field, e.g. `journal` or `claims`,
+        can be given.
         """
         return cls(
             globs=["*/"],  # doesn't seem like trailing slash is helpful here
@@ -307,7 +844,10 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
             output_dir=output_dir,
             name_mapper=name_mapper,
             fail_if_empty=fail_if_empty,
-            filter=lambda p: p.is_dir() and filter(p),
+            filter=filter,
+            exclude=exclude,
+            kind="dir",
+            **kwargs,
         )
 
     @classmethod
@@ -318,6 +858,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         name_mapper: NameMapper = _verbatim,
         fail_if_empty: bool = True,
         filter: Callable[[Path], bool] = _include_all,
+        exclude: Sequence[Union[str, Pattern]] = (),
+        **kwargs,
     ) -> "PathMapper":
         """
         Constructor for `PathMapper` for working with subpaths of `input_dir` which are
@@ -329,7 +871,8 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         Parameters
         ----------
 
-        See field documentation.
+        See field documentation. Any field, e.g. `journal` or `claims`,
+        can be given.
         """
         return cls(
             globs=["**/"],
@@ -337,25 +880,137 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
             output_dir=output_dir,
             name_mapper=name_mapper,
             fail_if_empty=fail_if_empty,
-            filter=lambda p: cls._is_deep_dir(p) and filter(p),
+            filter=filter,
+            exclude=exclude,
+            kind="leaf",
+            **kwargs,
         )
 
-    @staticmethod
-    def _is_deep_dir(p: Path) -> bool:
+    def iter_input(self) -> Iterator[Path]:
         """
-        :return: True if given path is a directory which does not contain subdirectories
+        :return: an iterator over input files
+
+        The input directory is read once, no matter how many `globs` are given.
+        Paths are yielded in the order they are found: the matching contents of
+        a directory come before the contents of its subdirectories. A path which
+        matches more than one of `globs` is yielded once.
         """
-        if not p.is_dir():
-            return False
-        dirs = filter(lambda subpath: subpath.is_dir(), p.glob("*/"))
-        return next(dirs, None) is None
+        return (Path(path) for path, _ in self._iter_found())
 
-    def iter_input(self) -> Iterator[Path]:
+    def _iter_found(
+        self, sharded: bool = True
+    ) -> Iterator[Tuple[str, Optional["Entry"]]]:
         """
-        :return: an iterator over input files
+        :param sharded: only yield the share of this replica, see `shard`
+        :return: input paths, with their `os.DirEntry` if they were just found
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            found = ((p, None) for p in snapshot)
+        else:
+            found = self._scan()
+        rank, size = self._get_rank()
+        if not sharded or size == 1:
+            return iter(found)
+        from chris_plugin._shard import shard
+
+        sized = (
+            (
+                (path, entry),
+                self._relative(path),
+                _shard_size(path, entry),
+            )
+            for path, entry in found
+        )
+        return iter(shard(sized, rank, size))
+
+    def _get_rank(self) -> Tuple[int, int]:
+        if self.shard is None:
+            return 0, 1
+        if self.shard == "auto":
+            from chris_plugin._shard import detect_rank
+
+            return detect_rank()
+        return self.shard
+
+    def _relative(self, input_path: str) -> str:
+        """
+        Fast equivalent of `str(Path(input_path).relative_to(self.input_dir))`
+        for paths found by this `PathMapper`.
+        """
+        prefix = self._cache.prefix
+        if prefix is None:
+            prefix = self._cache.prefix = os.path.join(str(self.input_dir), "")
+        if input_path.startswith(prefix):
+            return input_path[len(prefix) :]
+        return str(Path(input_path).relative_to(self.input_dir))
+
+    def _scan(self) -> Iterator[Tuple[str, "Entry"]]:
+        from chris_plugin._walk import walk, walk_threaded
+
+        if self.walk_threads == 1:
+            entries = walk(
+                str(self.input_dir),
+                self.globs,
+                self.kind,
+                self.exclude,
+                self.follow_symlinks,
+            )
+        else:
+            from chris_plugin.limits import get_cpu_count
+
+            entries = walk_threaded(
+                str(self.input_dir),
+                self.globs,
+                self.kind,
+                workers=self.walk_threads or get_cpu_count(),
+                ordered=self.walk_ordered,
+                exclude=self.exclude,
+                follow_symlinks=self.follow_symlinks,
+            )
+        found = ((entry.path, entry) for entry in entries)
+        if self.filter is not _include_all:
+            found = ((p, entry) for p, entry in found if self.filter(Path(p)))
+        if self.dedupe:
+            from chris_plugin._inodes import InodeSet
+
+            found = _unique(found, InodeSet())
+        if self.order is not None:
+            from chris_plugin._order import sort_key
+
+            key = sort_key(self.order)
+            found = sorted(found, key=lambda t: key(t[1]))
+        return found
+
+    def _get_snapshot(self) -> Optional[_Snapshot]:
+        """
+        Record the input paths if `snapshot=True` and they were not recorded yet.
+
+        :return: the recording, or `None` if disabled or over `snapshot_limit`
+        """
+        if not self.snapshot:
+            return None
+        cache = self._cache
+        with cache.lock:
+            if cache.snapshot is None and not cache.snapshot_overflow:
+                snapshot = _Snapshot()
+                for path, _ in self._scan():
+                    if len(snapshot) >= self.snapshot_limit:
+                        cache.snapshot_overflow = True
+                        break
+                    snapshot.append(path)
+                else:
+                    cache.snapshot = snapshot.seal()
+            return cache.snapshot
+
+    def refresh(self) -> None:
         """
-        for glob in self.globs:
-            yield from filter(self.filter, self.input_dir.glob(glob))
+        Discard the recording of input paths made when `snapshot=True`,
+        so that the next call will traverse `input_dir` again.
+        """
+        with self._cache.lock:
+            self._cache.snapshot = None
+            self._cache.snapshot_overflow = False
 
     def __len__(self):
         return self.count()
@@ -364,23 +1019,688 @@ class PathMapper(Iterable[Tuple[Path, Path]]):
         """
         Count the number of input paths under `input_dir`.
         """
+        snapshot = self._get_snapshot()
+        if snapshot is not None and self._get_rank()[1] == 1:
+            return len(snapshot)
         return sum(map(lambda _: 1, self.iter_input()))
 
-    def is_empty(self) -> bool:
-        return next(self.iter_input(), None) is None
+    def is_empty(self, sharded: bool = True) -> bool:
+        """
+        Check whether there are no input paths under `input_dir`.
+
+        :param sharded: only consider the share of this replica, see `shard`
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is not None and (not sharded or self._get_rank()[1] == 1):
+            return len(snapshot) == 0
+        return next(self._iter_found(sharded), None) is None
 
     def __iter__(self) -> Iterator[Tuple[Path, Path]]:
-        if self.fail_if_empty and self.is_empty():
-            print(
-                f'no input found for "{self.input_dir}/{{{",".join(self.globs)}}}"',
-                file=sys.stderr,
+        try:
+            for input_path, output_path, _ in self._iter_pairs(record=True):
+                yield input_path, output_path
+        finally:
+            self._finish()
+
+    def iter_mmap(
+        self, dtype=None, offset: int = 0, shape: Optional[Sequence[int]] = None
+    ) -> Iterator[Tuple[Path, Path, Union[memoryview, "numpy.ndarray"]]]:
+        """
+        Same as iterating over this `PathMapper`, but also yields the contents of
+        each input file mapped into memory (see `chris_plugin.helpers.mmap_file`).
+        A mapping is closed when the next pair is asked for.
+
+        Examples
+        --------
+
+        ```python
+        mapper = PathMapper.file_mapper(input_dir, output_dir, glob='**/*.raw')
+        for input_file, output_file, volume in mapper.iter_mmap(dtype='<f4'):
+            np.save(output_file, volume.reshape(-1, 256, 256).mean(axis=0))
+        ```
+
+        Parameters
+        ----------
+        dtype: numpy.dtype
+            If given, data is a read-only `numpy.ndarray` of this type.
+            Otherwise, a `memoryview` of bytes.
+        offset: int
+            number of bytes at the start of each file to skip
+        shape: Sequence[int]
+            shape of arrays, if `dtype` is given
+        """
+        from chris_plugin.helpers import mmap_file
+
+        for input_path, output_path in self:
+            with mmap_file(input_path, dtype, offset, shape) as data:
+                yield input_path, output_path, data
+
+    def _iter_found_or_exit(self) -> Iterator[Tuple[str, Optional["Entry"]]]:
+        """
+        Same as `_iter_found`, but exits the program if there are no inputs
+        and `fail_if_empty=True`.
+        """
+        found = self._iter_found()
+        first = next(found, None)
+        if first is None:
+            # another replica may have all the inputs
+            if self.fail_if_empty and self.is_empty(sharded=False):
+                print(
+                    f'no input found for "{self.input_dir}/{{{",".join(self.globs)}}}"',
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+            return iter(())
+        return itertools.chain((first,), found)
+
+    def _iter_nonempty(self) -> Iterator[Tuple[str, Optional["Entry"]]]:
+        """
+        Same as `_iter_found_or_exit`, but also starts `mirror` and `stats`,
+        and prefetches inputs.
+        """
+        self._start_mirror()
+        self._get_stats()
+        found = self._iter_found_or_exit()
+        if self.prefetch > 0:
+            from chris_plugin._prefetch import default_max_bytes, prefetch
+
+            max_bytes = self.prefetch_bytes
+            if max_bytes is None:
+                max_bytes = default_max_bytes()
+            found = prefetch(found, self.prefetch, max_bytes)
+        return found
+
+    def entries(self) -> Iterator["PathEntry"]:
+        """
+        Same as iterating over this `PathMapper`, but yields `PathEntry`
+        records, which also have the size, modification time and inode number
+        of inputs, so they do not need to be queried again.
+
+        This uses less memory and time per input, because paths are handled as
+        `str` instead of `pathlib.Path`. If `name_mapper` is the default, then
+        no `pathlib.Path` object is created at all, unless `filter`, `journal`,
+        `claims`, or a result cache is used.
+        """
+        if (
+            self.journal is None
+            and self.claims is None
+            and self.stats is None
+            and self._get_result_cache() is None
+        ):
+            pairs = self._iter_pairs_str()
+        else:
+            pairs = ((str(i), str(o), e) for i, o, e in self._iter_pairs(record=True))
+        from chris_plugin._entry import PathEntry
+
+        try:
+            for input_path, output_path, entry in pairs:
+                yield PathEntry.of(input_path, output_path, entry)
+        finally:
+            self._finish()
+
+    def _iter_pairs_str(self) -> Iterator[Tuple[str, str, Optional["Entry"]]]:
+        """
+        Simplified `_iter_pairs` which is used when there is nothing to record.
+        """
+        for path, entry in self._iter_nonempty():
+            output_path = self._output_for_str(path)
+            if self.parents is True:
+                self._ensure_dir(os.path.dirname(output_path))
+            yield path, output_path, entry
+
+    def _output_for_str(self, input_path: str) -> str:
+        if self.name_mapper is not _verbatim:
+            return str(self.output_for(Path(input_path)))
+        rel = self._relative(input_path)
+        if rel == ".":
+            return str(self.output_dir)
+        return os.path.join(str(self.output_dir), rel)
+
+    def _iter_pairs(
+        self, record: bool, mkdir: bool = True, fetch: bool = True
+    ) -> Iterator[Tuple[Path, Path, Optional["Entry"]]]:
+        """
+        :param record: call `_complete` on a pair when the caller asks for the next pair
+        :param mkdir: create output parent directories if `parents=True`
+        :param fetch: skip inputs whose output is in the result cache
+        :return: input path, output path, and `os.DirEntry` of the input if available
+        """
+        found = self._iter_nonempty()
+        journal = self._get_journal()
+        result_cache = self._get_result_cache() if fetch else None
+        claims = self._get_claims()
+        stats = self._get_stats() if record else None
+        self._cache.exhausted = False
+        try:
+            requested = time.monotonic()
+            for path, entry in found:
+                input_path = Path(path)
+                output_path = self.output_for(input_path)
+                if journal is not None and journal.is_done(input_path, output_path):
+                    continue
+                if claims is not None and not claims.claim(self._key(input_path)):
+                    continue
+                if result_cache is not None:
+                    key = result_cache.key_or_none(
+                        input_path, self._output_name(output_path)
+                    )
+                    if key is not None and result_cache.fetch(
+                        input_path, output_path, key
+                    ):
+                        self._complete(input_path, output_path, store=False)
+                        continue
+                    with self._cache.lock:
+                        self._cache.result_keys[str(input_path)] = key
+                if mkdir and self.parents is True:
+                    self.ensure_parent(output_path)
+                started = time.monotonic()
+                yield input_path, output_path, entry
+                if stats is not None:
+                    finished = time.monotonic()
+                    stats.record(
+                        path,
+                        str(output_path),
+                        _input_size(path, entry),
+                        started - requested,
+                        finished - started,
+                    )
+                if record:
+                    self._complete(input_path, output_path)
+                requested = time.monotonic()
+            self._cache.exhausted = True
+        finally:
+            if journal is not None:
+                journal.flush()
+
+    def _complete(
+        self, input_path: Path, output_path: Path, store: bool = True
+    ) -> None:
+        """
+        Called when a pair has been processed.
+
+        :param store: add the output to the result cache
+        """
+        journal = self._get_journal()
+        if journal is not None:
+            journal.record(input_path, output_path)
+        if store:
+            result_cache = self._get_result_cache()
+            if result_cache is not None:
+                with self._cache.lock:
+                    key = self._cache.result_keys.pop(str(input_path), None)
+                if key is None:
+                    key = result_cache.key_or_none(
+                        input_path, self._output_name(output_path)
+                    )
+                result_cache.store(input_path, output_path, key)
+        claims = self._get_claims()
+        if claims is not None:
+            claims.complete(self._key(input_path))
+
+    def _finish(self) -> None:
+        """
+        Called when iteration over pairs ends. Pairs which were not completed
+        by then are given up.
+        """
+        journal = self._get_journal()
+        if journal is not None:
+            journal.close()  # reopened if this PathMapper is used again
+        with self._cache.lock:
+            self._cache.result_keys.clear()  # of pairs which were not completed
+        with self._cache.lock:
+            claims, self._cache.claims = self._cache.claims, None
+        if claims is not None:
+            claims.close(self.claim_cleanup and self._cache.exhausted)
+        with self._cache.lock:
+            mirror, self._cache.mirror = self._cache.mirror, None
+        if mirror is not None:
+            mirror.join()
+        self.sync()
+        with self._cache.lock:
+            stats, self._cache.stats = self._cache.stats, None
+        if stats is not None:
+            stats.write(self.output_dir / self.stats)
+
+    def _start_mirror(self) -> None:
+        if not self.mirror or self._get_rank()[0] != 0:
+            return
+        cache = self._cache
+        with cache.lock:
+            if cache.mirror is not None:
+                return
+            from chris_plugin._mirror import Mirror
+            from chris_plugin._walk import GlobMatcher
+
+            matcher = GlobMatcher(self.globs)
+
+            def is_input(rel_path: str, path: str) -> bool:
+                return matcher.matches_path(rel_path, False) and self.filter(Path(path))
+
+            def output_for(path: str) -> str:
+                return str(self.output_for(Path(path)))
+
+            cache.mirror = Mirror(
+                str(self.input_dir),
+                str(self.output_dir),
+                is_input,
+                output_for,
+                self.exclude,
+                self.mirror_hardlink,
             )
+            cache.mirror.start()
+
+    def _key(self, input_path: Path) -> str:
+        return str(input_path.relative_to(self.input_dir))
+
+    def _output_name(self, output_path: Path) -> str:
+        return os.path.relpath(output_path, self.output_dir)
+
+    def _get_claims(self) -> Optional["ClaimQueue"]:
+        if self.claims is None:
+            return None
+        from chris_plugin._claim import ClaimQueue
+
+        cache = self._cache
+        with cache.lock:
+            if cache.claims is None:
+                cache.claims = ClaimQueue(
+                    self.output_dir / self.claims, self.claim_lease
+                )
+            return cache.claims
+
+    def _get_result_cache(self) -> Optional["ResultCache"]:
+        if self.result_cache is True:
+            # no cache is active unless @chris_plugin imported the module
+            cache = sys.modules.get("chris_plugin.cache")
+            return None if cache is None else cache.get_active()
+        if self.result_cache is False:
+            return None
+        return self.result_cache
+
+    def _get_journal(self) -> Optional["Journal"]:
+        if self.journal is None:
+            return None
+        from chris_plugin._journal import Journal
+
+        cache = self._cache
+        with cache.lock:
+            if cache.journal is None:
+                cache.journal = Journal(
+                    self.output_dir / self.journal, self.input_dir, self.output_dir
+                )
+            return cache.journal
+
+    def ensure_parent(self, output_path: Path) -> Path:
+        """
+        Create the parent directory of `output_path` unless this `PathMapper`
+        has already done so. It is safe to call from multiple threads.
+
+        :return: `output_path`
+        """
+        self._ensure_dir(str(output_path.parent))
+        return output_path
+
+    def _ensure_dir(self, directory: str) -> None:
+        cache = self._cache
+        if directory not in cache.created_dirs:
+            with cache.mkdir_lock:
+                if directory not in cache.created_dirs:
+                    Path(directory).mkdir(parents=True, exist_ok=True)
+                    cache.created_dirs.add(directory)
+
+    def open_output(self, output_path: Path, mode: str = "w", **kwargs) -> IO:
+        """
+        Create the parent directory of `output_path` if needed, then open it.
+        Useful with `parents="lazy"`.
+
+        Parameters
+        ----------
+        output_path: Path
+            an output path produced by this `PathMapper`
+        mode: str
+            see `open`
+        kwargs
+            passed to `open`
+        """
+        return self.ensure_parent(output_path).open(mode, **kwargs)
+
+    @contextmanager
+    def atomic_path(self, output_path: Path) -> Iterator[Path]:
+        """
+        Context manager for writing an output file atomically: a temporary path
+        in the same directory is yielded, and when the context exits, the
+        temporary file is renamed to `output_path`. If an exception is raised,
+        the temporary file is deleted instead. Either way, `output_path` is
+        never left partially written, even if the process is killed.
+
+        The parent directory of `output_path` is created if needed.
+        See `durability` for when outputs are flushed to stable storage.
+
+        Examples
+        --------
+
+        Write an output with an external program:
+
+        ```python
+        for input_file, output_file in mapper:
+            with mapper.atomic_path(output_file) as tmp:
+                subprocess.run(['convert', input_file, tmp], check=True)
+        ```
+        """
+        self.ensure_parent(output_path)
+        durability = self.durability
+        if durability == "batch" and self._cache.unpickled:
+            durability = "file"
+        from chris_plugin._atomic import atomic_path
+
+        with atomic_path(output_path, durability, self._get_pending_sync()) as tmp:
+            yield tmp
+
+    @contextmanager
+    def atomic_open(self, output_path: Path, mode: str = "w", **kwargs) -> Iterator[IO]:
+        """
+        Like `open_output`, but the file is written atomically (see `atomic_path`).
+
+        Examples
+        --------
+
+        ```python
+        for input_file, output_file in mapper:
+            with mapper.atomic_open(output_file) as f:
+                f.write(process(input_file.read_text()))
+        ```
+        """
+        if not any(c in mode for c in "wx"):
+            raise ValueError(f'mode must be for writing a new file: "{mode}"')
+        with self.atomic_path(output_path) as tmp:
+            with tmp.open(mode, **kwargs) as f:
+                yield f
+
+    def sync(self) -> None:
+        """
+        Flush outputs written by `atomic_path` or `atomic_open` with
+        `durability="batch"` to stable storage. It is called automatically
+        when iteration over this `PathMapper` ends.
+        """
+        pending_sync = self._cache.pending_sync
+        if pending_sync is not None:
+            pending_sync.sync()
+
+    def _get_pending_sync(self) -> "PendingSync":
+        from chris_plugin._atomic import PendingSync
+
+        cache = self._cache
+        with cache.lock:
+            if cache.pending_sync is None:
+                cache.pending_sync = PendingSync()
+            return cache.pending_sync
+
+    def map(
+        self,
+        fn: Callable[[Path, Path], T],
+        workers: Optional[int] = None,
+        executor: Union["ExecutorType", "Executor"] = "thread",
+        ordered: bool = True,
+        fail_fast: bool = True,
+        max_pending: Optional[int] = None,
+    ) -> Iterator[T]:
+        """
+        Call `fn(input_path, output_path)` for every pair of this `PathMapper`
+        in parallel, yielding the return values of `fn`.
+
+        Like the builtin `map`, nothing happens until the returned iterator is
+        iterated over. At most `max_pending` calls are submitted to the pool at
+        a time, so memory usage does not depend on the number of inputs.
+
+        Examples
+        --------
+
+        ```python
+        def segmentation(input_file: Path, output_file: Path) -> int:
+            ...
+
+        mapper = PathMapper.file_mapper(input_dir, output_dir, glob='**/*.nii')
+        for _ in mapper.map(segmentation, fail_fast=False):
+            pass
+        ```
+
+        Parameters
+        ----------
+        fn: Callable
+            Function to call for each pair of input and output paths.
+            It must be picklable (e.g. not a lambda) if `executor="process"`.
+        workers: int
+            Number of threads or processes. If `None`, the number of CPUs
+            available (`chris_plugin.limits.get_cpu_count`) is used.
+        executor: str | concurrent.futures.Executor
+            Either `"thread"` or `"process"` to create a pool of threads or
+            processes, or an existing executor to submit calls to.
+        ordered: bool
+            If `True`, results are yielded in the same order as the inputs.
+            Otherwise, results are yielded as soon as they are ready.
+        fail_fast: bool
+            If `True`, when `fn` raises an exception, calls which have not started
+            yet are cancelled and the exception is raised. If `False`, every input
+            is processed, then `chris_plugin.MapError` is raised with all failures.
+        max_pending: int
+            Maximum number of calls submitted but not yet yielded.
+            Defaults to twice the number of workers.
+        """
+        from chris_plugin._executor import bounded_map
+        from chris_plugin.limits import get_cpu_count
+
+        if workers is None:
+            workers = get_cpu_count()
+        found = self._iter_pairs(record=False, fetch=False)
+        result_cache = self._get_result_cache()
+        on_success = self._complete
+        if result_cache is not None:
+            fn = _CachedCall(fn, result_cache, self.output_dir)
+            on_success = functools.partial(self._complete, store=False)
+        if self.stats is not None:
+            submitted: Dict[Path, Tuple[float, int]] = {}
+            pairs = _timestamp(found, submitted)
+            from chris_plugin._stats import TimedCall
+
+            fn = TimedCall(fn)
+        else:
+            pairs = ((i, o) for i, o, _ in found)
+        results = bounded_map(
+            fn,
+            pairs,
+            executor=executor,
+            workers=workers,
+            max_pending=(2 * workers if max_pending is None else max_pending),
+            ordered=ordered,
+            fail_fast=fail_fast,
+            on_success=on_success,
+        )
+        if self.stats is not None:
+            results = self._record_timed(results, submitted)
+        if result_cache is not None:
+            results = _unwrap_cached(results, result_cache)
+        return _finish_after(results, self)
+
+    def _record_timed(
+        self, results: Iterator["Timed"], submitted: Dict[Path, Tuple[float, int]]
+    ) -> Iterator[T]:
+        stats = self._get_stats()
+        for timed in results:
+            requested, input_bytes = submitted.pop(timed.input_path)
+            if isinstance(timed.value, _CacheResult) and timed.value.hit:
+                yield timed.value
+                continue
+            wait = timed.started - requested
+            seconds = timed.finished - timed.started
+            stats.record(
+                str(timed.input_path),
+                str(timed.output_path),
+                input_bytes,
+                wait,
+                seconds,
+            )
+            yield timed.value
+
+    def _get_stats(self) -> Optional["Stats"]:
+        if self.stats is None:
+            return None
+        from chris_plugin._stats import Stats
+
+        cache = self._cache
+        with cache.lock:
+            if cache.stats is None:
+                cache.stats = Stats(self.stats_slowest)
+            return cache.stats
+
+    def imap_unordered(self, fn: Callable[[Path, Path], T], **kwargs) -> Iterator[T]:
+        """
+        Shorthand for `PathMapper.map` with `ordered=False`.
+        """
+        return self.map(fn, ordered=False, **kwargs)
+
+    def batches(
+        self, max_items: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> Iterator[List[Tuple[Path, Path]]]:
+        """
+        Yield lists of input and output path pairs, for processing inputs in groups,
+        e.g. for vectorized computation or batched model inference.
+
+        Batches are packed as close to `max_bytes` as possible, using the sizes of
+        input files. The order of pairs is not preserved. Output parent directories
+        of every pair in a batch are created before the batch is yielded (unless
+        `parents` is not `True`), and a batch is considered complete (see
+        `journal`) when the next batch is asked for.
+
+        Examples
+        --------
+
+        ```python
+        mapper = PathMapper.file_mapper(input_dir, output_dir, glob='**/*.png')
+        for batch in mapper.batches(max_items=32, max_bytes=256 * 1024**2):
+            images = np.stack([load(input_file) for input_file, _ in batch])
+            for (_, output_file), label in zip(batch, model.predict(images)):
+                output_file.write_text(label)
+        ```
+
+        Parameters
+        ----------
+        max_items: int
+            maximum number of pairs per batch
+        max_bytes: int
+            maximum total size of input files per batch. An input file which is
+            bigger is yielded in a batch by itself.
+        """
+        if max_items is None and max_bytes is None:
+            raise ValueError("At least one of max_items or max_bytes must be given")
+        if max_items is not None and max_items < 1:
+            raise ValueError(f"max_items must be at least 1: {max_items}")
+        from chris_plugin._batch import pack
+
+        def sized() -> Iterator[Tuple[Tuple[Path, Path, int], int]]:
+            for input_path, output_path, entry in self._iter_pairs(
+                record=False, mkdir=False
+            ):
+                size = _input_size(input_path, entry)
+                yield (input_path, output_path, size), size
+
+        stats = self._get_stats()
+        try:
+            requested = time.monotonic()
+            for batch in pack(sized(), max_items, max_bytes):
+                if self.parents is True:
+                    for _, output_path, _ in batch:
+                        self.ensure_parent(output_path)
+                started = time.monotonic()
+                yield [
+                    (input_path, output_path) for input_path, output_path, _ in batch
+                ]
+                if stats is not None:
+                    # time is only known per batch, so it is shared equally
+                    finished = time.monotonic()
+                    wait = (started - requested) / len(batch)
+                    seconds = (finished - started) / len(batch)
+                    for input_path, output_path, size in batch:
+                        stats.record(
+                            str(input_path), str(output_path), size, wait, seconds
+                        )
+                for input_path, output_path, _ in batch:
+                    self._complete(input_path, output_path)
+                requested = time.monotonic()
+        finally:
+            self._finish()
+
+    def plan(
+        self, create_dirs: bool = False, output: Optional[Union[str, Path]] = None
+    ) -> "Plan":
+        """
+        Compute the output path of every input path without processing anything,
+        to detect collisions (e.g. caused by a `name_mapper` which maps different
+        inputs to the same output) and estimate the amount of data to process.
+
+        Outputs are indexed in a dictionary, so planning takes linear time.
+
+        Examples
+        --------
+
+        ```python
+        plan = mapper.plan(create_dirs=True)
+        if plan.collisions:
+            print(f'error: {len(plan.collisions)} outputs would be overwritten')
             sys.exit(1)
-        for input_path in self.iter_input():
-            output_path = self.output_for(input_path)
-            if self.parents:
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-            yield input_path, output_path
+        print(f'processing {plan.count} files ({plan.total_bytes / 1e9:.1f} GB)')
+        ```
+
+        Parameters
+        ----------
+        create_dirs: bool
+            If `True`, create every output parent directory now, instead of one
+            at a time during iteration.
+        output: str | Path
+            If given, write the plan as JSON to this file, relative to `output_dir`
+            (or an absolute path): an object with `"pairs"`, a list of input and
+            output paths, and the fields of `Plan`. Pairs are written as they are
+            found, so they are not kept in memory.
+        """
+        import json
+
+        from chris_plugin._plan import Plan
+
+        plan = Plan()
+        outputs: Dict[str, str] = {}
+        dirs: Set[str] = set()
+        writer = None
+        if output is not None:
+            plan_file = self.output_dir / output
+            plan_file.parent.mkdir(parents=True, exist_ok=True)
+            writer = open(plan_file, "w")
+        try:
+            if writer is not None:
+                writer.write('{"pairs": [')
+            for path, entry in self._iter_found_or_exit():
+                output_path = self._output_for_str(path)
+                if writer is not None:
+                    separator = ",\n" if plan.count else "\n"
+                    writer.write(separator + json.dumps([path, output_path]))
+                plan.count += 1
+                if not (entry.is_dir() if entry is not None else os.path.isdir(path)):
+                    plan.total_bytes += _input_size(path, entry)
+                first = outputs.setdefault(output_path, path)
+                if first != path:
+                    plan.collisions.setdefault(output_path, [first]).append(path)
+                dirs.add(os.path.dirname(output_path))
+            plan.directories = len(dirs)
+            if writer is not None:
+                writer.write("\n]")
+                for key, value in asdict(plan).items():
+                    writer.write(f", {json.dumps(key)}: {json.dumps(value)}")
+                writer.write("}\n")
+        finally:
+            if writer is not None:
+                writer.close()
+        if create_dirs:
+            for d in dirs:
+                self._ensure_dir(d)
+        return plan
 
     def output_for(self, input_path: Path) -> Path:
         """
@@ -0,0 +1,206 @@
+import os
+import threading
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+from chris_plugin import chris_plugin, PathMapper
+import chris_plugin.cache as cache_module
+from chris_plugin.cache import ResultCache, hash_file, namespace_of
+
+
+def test_hash_file_chunked(monkeypatch, tmp_path: Path):
+    f = tmp_path / "data"
+    f.write_bytes(os.urandom(1000))
+    whole = hash_file(f)
+    monkeypatch.setattr(cache_module, "CHUNK_SIZE", 64)
+    chunked = hash_file(f)
+    assert chunked == hash_file(f, workers=1)
+    f.write_bytes(f.read_bytes()[:-1] + b"!")
+    assert hash_file(f) != chunked
+    assert whole != chunked
+
+
+def test_namespace():
+    a = namespace_of("1.0", Namespace(x=1, inputdir="a", outputdir="b"))
+    b = namespace_of("1.0", Namespace(x=1, inputdir="c", outputdir="d"))
+    assert a == b
+    assert a != namespace_of("1.1", Namespace(x=1))
+    assert a != namespace_of("1.0", Namespace(x=2))
+
+
+@pytest.fixture
+def dirs(tmp_path: Path):
+    inputdir = tmp_path / "incoming"
+    inputdir.mkdir()
+    (inputdir / "a.txt").write_text("apple")
+    (inputdir / "b.txt").write_text("banana")
+    return inputdir, tmp_path / "outgoing", tmp_path / "cache"
+
+
+def test_result_cache(dirs):
+    inputdir, outputdir, cachedir = dirs
+    processed = []
+
+    @chris_plugin(singleton=False, result_cache=str(cachedir))
+    def main(options, inputdir: Path, outputdir: Path):
+        for i, o in PathMapper.file_mapper(inputdir, outputdir):
+            processed.append(i.name)
+            o.write_text(i.read_text().upper() * options.times)
+
+    main(Namespace(times=1), inputdir, outputdir)
+    assert sorted(processed) == ["a.txt", "b.txt"]
+
+    processed.clear()
+    rerun = outputdir.parent / "rerun"
+    (inputdir / "b.txt").write_text("blueberry")
+    main(Namespace(times=1), inputdir, rerun)
+    assert processed == ["b.txt"]
+    assert (rerun / "a.txt").read_text() == "APPLE"
+    assert (rerun / "b.txt").read_text() == "BLUEBERRY"
+
+    processed.clear()
+    main(Namespace(times=2), inputdir, outputdir.parent / "different_options")
+    assert sorted(processed) == ["a.txt", "b.txt"]
+
+
+def test_result_cache_map(dirs):
+    inputdir, outputdir, cachedir = dirs
+    cache = ResultCache(cachedir, "namespace")
+
+    def process(i: Path, o: Path):
+        o.write_text(i.read_text())
+        return i.name
+
+    first = PathMapper(inputdir, outputdir, kind="file", result_cache=cache)
+    assert sorted(first.map(process, workers=2)) == ["a.txt", "b.txt"]
+    second = PathMapper(inputdir, outputdir / "again", result_cache=cache)
+    assert list(second.map(process, workers=2)) == []
+    assert (outputdir / "again" / "a.txt").read_text() == "apple"
+
+
+def test_eviction(tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache", "namespace", max_bytes=10)
+    inputs = []
+    for name in "abcd":
+        i = tmp_path / f"{name}.in"
+        o = tmp_path / f"{name}.out"
+        i.write_text(name)
+        assert not cache.fetch(i, o)
+        o.write_text("12345")
+        cache.store(i, o)
+        inputs.append(i)
+    blobs = list((tmp_path / "cache").glob("*/*"))
+    assert sum(p.stat().st_size for p in blobs) <= 10
+    assert cache.fetch(inputs[-1], tmp_path / "fetched" / "d.out")
+    assert not cache.fetch(inputs[0], tmp_path / "fetched" / "a.out")
+    assert (tmp_path / "d.out").read_text() == "12345"
+
+
+def _copy(i: Path, o: Path) -> str:
+    o.write_text(i.read_text())
+    return i.name
+
+
+def test_result_cache_hashed_in_workers(mocker, dirs):
+    inputdir, outputdir, cachedir = dirs
+    cache = ResultCache(cachedir, "namespace")
+    key_of = cache.key_of
+    hashed_in = []
+
+    def spy(input_path, output_name):
+        hashed_in.append(threading.get_ident())
+        return key_of(input_path, output_name)
+
+    mocker.patch.object(cache, "key_of", side_effect=spy)
+    mapper = PathMapper(inputdir, outputdir, kind="file", result_cache=cache)
+    assert sorted(mapper.map(_copy, workers=2)) == ["a.txt", "b.txt"]
+    assert len(hashed_in) == 2
+    assert threading.get_ident() not in hashed_in
+
+
+def test_result_cache_process(dirs):
+    inputdir, outputdir, cachedir = dirs
+    cache = ResultCache(cachedir, "namespace")
+    mapper = PathMapper(inputdir, outputdir, kind="file", result_cache=cache)
+    results = mapper.map(_copy, workers=2, executor="process")
+    assert sorted(results) == ["a.txt", "b.txt"]
+    again = PathMapper(inputdir, outputdir / "again", result_cache=cache)
+    assert list(again.map(_copy, workers=2, executor="process")) == []
+    assert (outputdir / "again" / "b.txt").read_text() == "banana"
+
+
+def test_result_cache_output_name(dirs):
+    inputdir, outputdir, cachedir = dirs
+    (inputdir / "scan.nii").write_text("image")
+    cache = ResultCache(cachedir, "namespace")
+    processed = []
+
+    def process(i: Path, o: Path):
+        processed.append(o.name)
+        o.write_text(i.name)
+
+    mask = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.nii", suffix=".mask", result_cache=cache
+    )
+    for i, o in mask:
+        process(i, o)
+    report = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.nii", suffix=".json", result_cache=cache
+    )
+    for i, o in report:
+        process(i, o)
+    assert processed == ["scan.mask", "scan.json"]
+    assert (outputdir / "scan.json").read_text() == "scan.nii"
+
+
+def test_fetch_evicted(mocker, tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache", "namespace")
+    i = tmp_path / "input"
+    i.write_text("data")
+    o = tmp_path / "output"
+    o.write_text("result")
+    cache.store(i, o)
+    (blob,) = cache._blobs()
+    copy_file = cache_module.copy_file
+
+    def evict_then_copy(src, dst, **kwargs):
+        # another process evicts the output after it was found
+        os.unlink(src)
+        os.unlink(cache_module._marker(Path(src)))
+        return copy_file(src, dst, **kwargs)
+
+    mocker.patch.object(cache_module, "copy_file", side_effect=evict_then_copy)
+    assert not cache.fetch(i, tmp_path / "fetched" / "output")
+    assert not (tmp_path / "fetched" / "output").exists()
+    assert not cache_module._marker(blob).exists()
+
+
+def test_size_of_evicted(mocker, tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache", "namespace")
+    mocker.patch.object(cache, "_blobs", return_value=[tmp_path / "evicted"])
+    cache.account(5)
+    assert cache._size == 0
+
+
+def test_fetch_does_not_touch_outputs(tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache", "namespace")
+    i = tmp_path / "input"
+    i.write_text("data")
+    os.utime(i, ns=(0, 0))
+    o = tmp_path / "output"
+    os.link(i, o)  # e.g. by helpers.copy_file
+    cache.store(i, o)
+    assert cache.fetch(i, tmp_path / "fetched" / "output")
+    assert i.stat().st_mtime_ns == 0
+
+
+def test_failed_keys_forgotten(dirs):
+    inputdir, outputdir, cachedir = dirs
+    cache = ResultCache(cachedir, "namespace")
+    mapper = PathMapper(inputdir, outputdir, kind="file", result_cache=cache)
+    with pytest.raises(RuntimeError):
+        for _ in mapper:
+            raise RuntimeError("failed")
+    assert mapper._cache.result_keys == {}
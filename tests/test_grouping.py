@@ -0,0 +1,97 @@
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from chris_plugin import GroupMapper, PathMapper
+from chris_plugin.cache import ResultCache
+from chris_plugin.grouping import by_directory, by_pattern, by_stem
+
+
+@pytest.fixture
+def dirs(tmp_path: Path) -> Tuple[Path, Path]:
+    inputdir = tmp_path / "incoming"
+    files = [
+        "series1/slice002.dcm",
+        "series1/slice001.dcm",
+        "series2/slice001.dcm",
+        "sub/scan.nii.gz",
+        "sub/scan.json",
+        "sub/other.nii.gz",
+        "README.txt",
+    ]
+    for f in files:
+        (inputdir / f).parent.mkdir(parents=True, exist_ok=True)
+        (inputdir / f).touch()
+    return inputdir, tmp_path / "outgoing"
+
+
+def _names(inputs: List[Path]) -> List[str]:
+    return [p.name for p in inputs]
+
+
+def test_by_directory(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, glob="**/*.dcm")
+    groups = {key: (inputs, output) for key, inputs, output in GroupMapper(mapper)}
+    assert set(groups) == {"series1", "series2"}
+    inputs, output = groups["series1"]
+    assert _names(inputs) == ["slice001.dcm", "slice002.dcm"]
+    assert output == outputdir / "series1"
+    assert outputdir.is_dir()
+    assert by_directory("README.txt") == "."
+
+
+def test_by_stem(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    groups = GroupMapper(mapper, key=by_stem([".json", ".nii.gz"]))
+    actual = {g.key: _names(g.inputs) for g in groups}
+    assert actual == {
+        "sub/scan": ["scan.json", "scan.nii.gz"],
+        "sub/other": ["other.nii.gz"],
+    }
+
+
+def _count(key: str, inputs: List[Path], output: Path) -> Tuple[str, int]:
+    return key, len(inputs)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_map(dirs: Tuple[Path, Path], executor: str):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    groups = GroupMapper(mapper, key=by_pattern(r"(series\d+)/slice\d+\.dcm"))
+    results = groups.map(_count, workers=2, executor=executor)
+    assert sorted(results) == [("series1", 2), ("series2", 1)]
+
+
+@pytest.mark.parametrize("use_map", [False, True])
+def test_mirror(dirs: Tuple[Path, Path], use_map: bool):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, glob="**/*.dcm", mirror=True)
+    groups = GroupMapper(mapper)
+    if use_map:
+        list(groups.map(_count, workers=2))
+    else:
+        list(groups)
+    assert mapper._cache.mirror is None
+    assert (outputdir / "README.txt").is_file()
+    assert (outputdir / "sub/scan.json").is_file()
+    assert not (outputdir / "series1/slice001.dcm").exists()
+
+
+@pytest.mark.parametrize(
+    "option",
+    [
+        {"journal": "journal.jsonl"},
+        {"claims": "claims"},
+        {"stats": "stats.json"},
+        {"result_cache": ResultCache("cache", "grouping")},
+    ],
+)
+def test_unsupported(dirs: Tuple[Path, Path], option: dict):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, **option)
+    with pytest.raises(ValueError):
+        GroupMapper(mapper)
@@ -1,6 +1,12 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+
 import pytest
 
-from chris_plugin.helpers import parse_csv_as_dict
+import chris_plugin.helpers as helpers
+from chris_plugin.helpers import parse_csv_as_dict, copy_file
 
 
 @pytest.mark.parametrize('input, expected', [
@@ -21,3 +27,70 @@ def test_parse_csv_as_dict(input: str, expected: dict):
 def test_parse_csv_as_dict_errors(input: str):
     with pytest.raises(SystemExit):
         parse_csv_as_dict(input)
+
+
+@pytest.fixture
+def src(tmp_path: Path) -> Path:
+    src = tmp_path / "src.bin"
+    src.write_bytes(os.urandom(100_000))
+    return src
+
+
+def _unsupported(*args):
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+@pytest.mark.parametrize(
+    "unsupported, expected",
+    [
+        ([], "hardlink"),
+        (["link"], "copy_file_range"),
+        (["link", "copy_file_range"], "sendfile"),
+        (["link", "copy_file_range", "sendfile"], "buffered"),
+    ],
+)
+def test_copy_file(monkeypatch, src: Path, unsupported, expected):
+    monkeypatch.setattr(helpers, "_reflink", lambda *args: False)
+    for name in unsupported:
+        monkeypatch.setattr(os, name, _unsupported)
+    dst = src.with_name("dst.bin")
+    assert copy_file(src, dst, hardlink=True) == expected
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.samefile(src) == (expected == "hardlink")
+
+
+def test_copy_file_not_linked_by_default(src: Path):
+    dst = src.with_name("dst.bin")
+    assert copy_file(src, dst) != "hardlink"
+    assert dst.read_bytes() == src.read_bytes()
+    assert not dst.samefile(src)
+
+
+def test_copy_file_overwrite(src: Path):
+    dst = src.with_name("dst.bin")
+    dst.write_text("a longer file which will be overwritten" * 10000)
+    assert copy_file(src, dst, hardlink=False) != "hardlink"
+    assert dst.read_bytes() == src.read_bytes()
+    with pytest.raises(shutil.SameFileError):
+        copy_file(src, src)
+
+
+def test_mmap_file(src: Path):
+    content = src.read_bytes()
+    with helpers.mmap_file(src, offset=10) as data:
+        assert data.readonly
+        assert data == content[10:]
+        kept = data[:5]
+    assert kept == content[10:15]
+    src.write_bytes(b"")
+    with helpers.mmap_file(src) as data:
+        assert len(data) == 0
+
+
+def test_mmap_file_numpy(src: Path):
+    numpy = pytest.importorskip("numpy")
+    with helpers.mmap_file(src, dtype="<u2", offset=4, shape=(10, 5)) as array:
+        assert array.shape == (10, 5)
+        expected = numpy.frombuffer(src.read_bytes()[4:104], dtype="<u2")
+        assert (array.ravel() == expected).all()
+        assert not array.flags.writeable
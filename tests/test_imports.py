@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+import pytest
+
+import chris_plugin
+from chris_plugin import chris_plugin as decorator
+
+
+def test_lazy_imports():
+    code = (
+        "import sys, chris_plugin\n"
+        "assert 'chris_plugin.mapper' not in sys.modules\n"
+        "assert 'chris_plugin.cache' not in sys.modules\n"
+        "from chris_plugin import PathMapper\n"
+        "assert 'chris_plugin.mapper' in sys.modules\n"
+        "assert 'chris_plugin.cache' not in sys.modules\n"
+        "assert 'concurrent.futures' not in sys.modules\n"
+        "assert 'chris_plugin.helpers' not in sys.modules\n"
+        "features = ('_atomic', '_batch', '_entry', '_executor', '_inodes',\n"
+        "            '_order', '_plan', '_shard', '_walk', 'limits')\n"
+        "for name in features:\n"
+        "    assert 'chris_plugin.' + name not in sys.modules, name\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_attributes():
+    for name in chris_plugin.__all__:
+        assert getattr(chris_plugin, name) is not None
+        assert name in dir(chris_plugin)
+    assert chris_plugin.PathMapper.__module__ == "chris_plugin.mapper"
+
+
+def test_parser_not_modified(tmp_path):
+    parser = ArgumentParser()
+    parser.add_argument("--name", default="x")
+
+    @decorator(parser=parser, singleton=False)
+    def main(options, inputdir, outputdir):
+        return options.name
+
+    assert main(parser.parse_args([]), tmp_path, tmp_path / "out") == "x"
+    assert [a.dest for a in parser._actions] == ["help", "name"]
+
+
+def test_parser_copied_when_decorated(tmp_path, monkeypatch):
+    parser = ArgumentParser()
+    parser.add_argument("--name", default="x")
+
+    @decorator(parser=parser, singleton=False)
+    def main(options, inputdir, outputdir):
+        return options.name
+
+    parser.add_argument("--late")
+    inputdir = str(tmp_path)
+    outputdir = str(tmp_path / "out")
+    monkeypatch.setattr(sys, "argv", ["prog", "--name", "y", inputdir, outputdir])
+    assert main() == "y"
+    monkeypatch.setattr(sys, "argv", ["prog", "--late", "z", inputdir, outputdir])
+    with pytest.raises(SystemExit):
+        main()
@@ -0,0 +1,15 @@
+import random
+
+from chris_plugin._inodes import InodeSet
+
+
+def test_inode_set():
+    rng = random.Random(0)
+    pairs = [(rng.randrange(3), rng.randrange(2**64)) for _ in range(5000)]
+    pairs += pairs[:1000] + [(0, 0), (1, 2**64 - 1), (1, 2**64 - 1)]
+    seen = InodeSet()
+    expected = set()
+    for dev, ino in pairs:
+        assert seen.add(dev, ino) == ((dev, ino) not in expected)
+        expected.add((dev, ino))
+    assert len(seen) == len(expected)
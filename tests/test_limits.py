@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+import chris_plugin.limits as limits
+
+
+@pytest.mark.parametrize("cpu_count, expected", [(6, 6), (None, 1)])
+def test_get_cpu_count_without_affinity(monkeypatch, cpu_count, expected):
+    monkeypatch.delattr(limits.os, "sched_getaffinity", raising=False)
+    monkeypatch.setattr(limits.os, "cpu_count", lambda: cpu_count)
+    assert limits.get_cpu_count() == expected
+
+
+@pytest.mark.parametrize(
+    "v2, v1, expected",
+    [
+        ("max\n", None, None),
+        ("1073741824\n", None, 1024**3),
+        (None, "536870912\n", 512 * 1024**2),
+        (None, f"{2**63 - 4096}\n", None),
+        (None, None, None),
+    ],
+)
+def test_get_memory_limit(monkeypatch, tmp_path: Path, v2, v1, expected):
+    for name, content in [
+        ("__CGROUP2_MEMORY_MAX_FILE", v2),
+        ("__CGROUP_MEMORY_LIMIT_FILE", v1),
+    ]:
+        p = tmp_path / name
+        if content is not None:
+            p.write_text(content)
+        monkeypatch.setattr(limits, name, p)
+    assert limits.get_memory_limit() == expected
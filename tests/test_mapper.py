@@ -1,8 +1,18 @@
+import dataclasses
+import functools
+import json
+import multiprocessing
+import os
+import pickle
 from pathlib import Path
 from typing import Tuple, List, Set
 
 import pytest
 
+import chris_plugin._stats
+import chris_plugin._walk
+from chris_plugin._claim import ClaimQueue
+from chris_plugin._executor import MapError, bounded_map
 from chris_plugin.mapper import _curry_suffix, PathMapper, curry_name_mapper
 
 
@@ -131,3 +141,668 @@ def test_curry_name_mapper(template: str, expected: str):
     output_dir = Path("outgoing")
     name_mapper = curry_name_mapper(template)
     assert name_mapper(Path("rel/fruity.dat"), output_dir) == Path(expected)
+
+
+def test_snapshot(mocker, dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    walk = mocker.spy(chris_plugin._walk, "walk")
+    mapper = PathMapper.file_mapper(inputdir, outputdir, snapshot=True)
+
+    assert not mapper.is_empty()
+    assert mapper.count() == len(files_to_create)
+    assert set(i for i, _ in mapper) == set(inputdir / f for f in files_to_create)
+    assert walk.call_count == 1
+
+    (inputdir / "new.txt").touch()
+    assert len(mapper) == len(files_to_create)
+    mapper.refresh()
+    assert len(mapper) == len(files_to_create) + 1
+    assert walk.call_count == 2
+
+
+def test_snapshot_limit(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, snapshot=True, snapshot_limit=2)
+    assert mapper.count() == len(list(inputdir.glob("**/*")))
+    assert mapper.count() == len(list(mapper))
+
+
+def _write_atomically(mapper: PathMapper, input_file: Path, output_file: Path):
+    with mapper.atomic_path(output_file) as tmp:
+        tmp.write_text(input_file.name)
+
+
+def test_pickle(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, kind="file", snapshot=True)
+    assert mapper.count() == len(files_to_create)
+    copy = pickle.loads(pickle.dumps(mapper))
+    assert copy == mapper
+    assert copy._cache is not mapper._cache
+    assert copy.count() == len(files_to_create)
+
+    fn = functools.partial(_write_atomically, mapper)
+    list(mapper.map(fn, workers=2, executor="process"))
+    for f in files_to_create:
+        assert (outputdir / f).read_text() == Path(f).name
+
+
+@pytest.mark.parametrize("walk_threads", [None, 2])
+@pytest.mark.parametrize("walk_ordered", [True, False])
+def test_walk_threads(
+    dirs: Tuple[Path, Path],
+    files_to_create: List[str],
+    walk_threads: int,
+    walk_ordered: bool,
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(
+        inputdir, outputdir, walk_threads=walk_threads, walk_ordered=walk_ordered
+    )
+    assert set(mapper.iter_input()) == set(inputdir.glob("**/*"))
+
+
+def _output_name(_input_path: Path, output_path: Path) -> str:
+    return output_path.name
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_map(dirs: Tuple[Path, Path], files_to_create: List[str], executor: str):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    expected = [o.name for _, o in mapper]
+    assert list(mapper.map(_output_name, workers=2, executor=executor)) == expected
+    assert set(mapper.imap_unordered(_output_name, workers=2)) == set(expected)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_map_bounded(
+    dirs: Tuple[Path, Path], files_to_create: List[str], ordered: bool
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    submitted = 0
+
+    def count_submissions():
+        nonlocal submitted
+        for pair in mapper:
+            submitted += 1
+            yield pair
+
+    results = bounded_map(
+        _output_name,
+        count_submissions(),
+        executor="thread",
+        workers=1,
+        max_pending=2,
+        ordered=ordered,
+        fail_fast=True,
+    )
+    next(results)
+    assert submitted <= 3
+    results.close()
+
+
+def _fail_on_coco(input_path: Path, _output_path: Path) -> str:
+    if input_path.name == "coco.txt":
+        raise ValueError("coco")
+    return input_path.name
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_map_fail_fast(
+    dirs: Tuple[Path, Path], files_to_create: List[str], ordered: bool
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    with pytest.raises(ValueError, match="coco"):
+        list(mapper.map(_fail_on_coco, workers=2, ordered=ordered))
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_map_keep_going(
+    dirs: Tuple[Path, Path], files_to_create: List[str], ordered: bool
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    results = []
+    with pytest.raises(MapError) as e:
+        for result in mapper.map(
+            _fail_on_coco, workers=2, ordered=ordered, fail_fast=False
+        ):
+            results.append(result)
+    assert len(results) == len(files_to_create) - 1
+    assert [i.name for i, _, _ in e.value.failures] == ["coco.txt"]
+
+
+def test_parents_created_once(
+    mocker, dirs: Tuple[Path, Path], files_to_create: List[str]
+):
+    inputdir, outputdir = dirs
+    for name in ["apple.txt", "banana.txt"]:
+        (inputdir / "a/b" / name).touch()
+    mkdir = mocker.spy(Path, "mkdir")
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    for _, o in mapper:
+        assert o.parent.is_dir()
+    created = [c.args[0] for c in mkdir.call_args_list if c.kwargs.get("parents")]
+    assert created.count(outputdir / "a/b") == 1
+
+
+@pytest.mark.parametrize(
+    "constructor",
+    [
+        PathMapper.file_mapper,
+        PathMapper.dir_mapper_shallow,
+        PathMapper.dir_mapper_deep,
+    ],
+)
+def test_constructor_options(
+    dirs: Tuple[Path, Path], files_to_create: List[str], constructor
+):
+    inputdir, outputdir = dirs
+    mapper = constructor(inputdir, outputdir, journal="journal.jsonl", claims="q")
+    assert (mapper.journal, mapper.claims) == ("journal.jsonl", "q")
+
+
+def test_parents_lazy(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, parents="lazy")
+    for i, o in mapper:
+        if i.name == "crane.txt":
+            continue
+        with mapper.open_output(o) as f:
+            f.write("hello")
+    assert (outputdir / "coco.txt").read_text() == "hello"
+    assert not (outputdir / "a").exists()
+
+
+def test_journal(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, journal="journal.jsonl")
+
+    with pytest.raises(RuntimeError):
+        for i, _ in mapper:
+            if i.name == "coco.txt":
+                raise RuntimeError("killed")
+    assert (outputdir / "journal.jsonl").exists()
+    assert mapper._cache.journal._file is None  # closed
+
+    (inputdir / "beryl.rb").write_text("changed")
+    resumed = dataclasses.replace(mapper)
+    visited = set(i for i, _ in resumed)
+    assert inputdir / "coco.txt" in visited
+    assert inputdir / "beryl.rb" in visited
+
+    assert list(dataclasses.replace(mapper)) == []
+
+
+def test_journal_map(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, journal="journal.jsonl")
+    with pytest.raises(MapError):
+        list(mapper.map(_fail_on_coco, workers=2, fail_fast=False))
+    resumed = dataclasses.replace(mapper)
+    assert [i.name for i, _ in resumed] == ["coco.txt"]
+
+
+def test_journal_truncated(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    outputdir.mkdir()
+    (outputdir / "journal.jsonl").write_text('{"input": "coco.txt", "out')
+    mapper = PathMapper(inputdir, outputdir, journal="journal.jsonl")
+    for _ in mapper:
+        pass
+    lines = (outputdir / "journal.jsonl").read_text().splitlines()
+    assert len(lines) == 1 + len(list(inputdir.glob("**/*")))
+
+
+def test_order_largest_first(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    for i, f in enumerate(files_to_create):
+        (inputdir / f).write_bytes(b"x" * i)
+    mapper = PathMapper.file_mapper(inputdir, outputdir, order="largest-first")
+    expected = [inputdir / f for f in reversed(files_to_create)]
+    assert list(mapper.iter_input()) == expected
+
+
+@pytest.mark.parametrize("order", ["inode", "directory"])
+def test_order_locality(
+    dirs: Tuple[Path, Path], files_to_create: List[str], order: str
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, kind="file", order=order)
+    actual = list(mapper.iter_input())
+    assert set(actual) == set(inputdir / f for f in files_to_create)
+    if order == "inode":
+        inodes = [p.stat().st_ino for p in actual]
+        assert inodes == sorted(inodes)
+
+
+def test_order_invalid(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    with pytest.raises(ValueError):
+        PathMapper(inputdir, outputdir, order="random")
+
+
+def test_batches(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    for i, f in enumerate(files_to_create):
+        (inputdir / f).write_bytes(b"x" * (i + 1))
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    batches = list(mapper.batches(max_items=3, max_bytes=6))
+    pairs = [pair for batch in batches for pair in batch]
+    assert sorted(pairs) == sorted(mapper)
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) == 1 or sum(i.stat().st_size for i, _ in batch) <= 6
+        assert all(o.parent.is_dir() for _, o in batch)
+
+
+def test_batches_journal(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, journal="journal.jsonl")
+    batches = mapper.batches(max_items=2)
+    assert len(next(batches)) == 2
+    batches.close()
+    resumed = dataclasses.replace(mapper)
+    assert set(i for i, _ in resumed) == set(mapper.iter_input())
+    list(dataclasses.replace(mapper).batches(max_items=2))
+    assert list(dataclasses.replace(mapper)) == []
+
+
+def test_batches_invalid(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    with pytest.raises(ValueError):
+        next(PathMapper(inputdir, outputdir).batches())
+
+
+def test_shard(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    for i, f in enumerate(files_to_create):
+        (inputdir / f).write_bytes(b"x" * 10 ** (i + 1))
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    shares = [
+        list(dataclasses.replace(mapper, shard=(rank, 2)).iter_input())
+        for rank in range(2)
+    ]
+    assert sorted(shares[0] + shares[1]) == sorted(mapper.iter_input())
+    biggest = inputdir / files_to_create[-1]
+    assert shares[0] == [biggest] or shares[1] == [biggest]
+
+
+def test_shard_directories(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    sizes = {"big": [400], "a": [100, 100], "b": [100], "c": [50, 50]}
+    for name, files in sizes.items():
+        for i, size in enumerate(files):
+            f = inputdir / name / "series" / f"{i}.dcm"
+            f.parent.mkdir(parents=True, exist_ok=True)
+            f.write_bytes(b"x" * size)
+    mapper = PathMapper.dir_mapper_shallow(inputdir, outputdir)
+    shares = [
+        {p.name for p in dataclasses.replace(mapper, shard=(rank, 2)).iter_input()}
+        for rank in range(2)
+    ]
+    assert {"big"} in shares
+
+
+def test_shard_auto(monkeypatch, dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, kind="file", shard="auto")
+    assert mapper.count() == len(files_to_create)
+    monkeypatch.setenv("SLURM_PROCID", "3")
+    monkeypatch.setenv("SLURM_NTASKS", "8")
+    assert mapper.count() == 1
+    monkeypatch.setenv("SLURM_PROCID", "5")
+    assert list(mapper) == []
+
+
+def test_shard_invalid(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    with pytest.raises(ValueError):
+        PathMapper(inputdir, outputdir, shard=(2, 2))
+
+
+def _claim_worker(inputdir: Path, outputdir: Path, claims: str):
+    mapper = PathMapper(inputdir, outputdir, kind="file", claims=claims)
+    for input_path, output_path in mapper:
+        with output_path.open("a") as f:
+            f.write(f"{os.getpid()}\n")
+
+
+def _run_claim_workers(inputdir: Path, outputdir: Path, claims: str):
+    inputdir.mkdir(parents=True)
+    for i in range(50):
+        (inputdir / f"{i}.txt").touch()
+    workers = [
+        multiprocessing.Process(
+            target=_claim_worker, args=(inputdir, outputdir, claims)
+        )
+        for _ in range(3)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+        assert w.exitcode == 0
+    outputs = [p.read_text() for p in outputdir.glob("*.txt")]
+    assert len(outputs) == 50
+    assert all(len(o.splitlines()) == 1 for o in outputs)
+
+
+def test_claims(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    _run_claim_workers(inputdir, outputdir, "claims")
+    assert (outputdir / "claims").is_dir()
+    assert list(PathMapper(inputdir, outputdir, claims="claims")) == []
+
+
+def test_claims_outside_output_dir(dirs: Tuple[Path, Path], tmp_path: Path):
+    inputdir, outputdir = dirs
+    claims = str(tmp_path / "claims")
+    _run_claim_workers(inputdir, outputdir, claims)
+    assert list(outputdir.iterdir()) == list(outputdir.glob("*.txt"))
+    assert list(PathMapper(inputdir, outputdir, claims=claims)) == []
+
+
+def test_claims_failed_kept(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(
+        inputdir, outputdir, kind="file", claims="q", claim_cleanup=True
+    )
+    with pytest.raises(MapError):
+        list(mapper.map(_fail_on_coco, workers=2, fail_fast=False))
+    assert (outputdir / "q").is_dir()
+    assert [i.name for i, _ in mapper] == ["coco.txt"]
+    assert not (outputdir / "q").exists()
+
+
+def test_claims_removed_while_starting(mocker, tmp_path: Path):
+    write_text = Path.write_text
+
+    def removed_once(self: Path, *args, **kwargs):
+        mocker.stopall()
+        self.parent.rmdir()  # as if by ClaimQueue.close in another process
+        return write_text(self, *args, **kwargs)
+
+    mocker.patch.object(Path, "write_text", removed_once)
+    queue = ClaimQueue(tmp_path / "q", 60)
+    assert queue.claim("coco.txt")
+    queue.complete("coco.txt")
+    queue.close(remove_if_done=True)
+    assert not (tmp_path / "q").exists()
+
+
+def test_claims_lease(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, kind="file", claims="q", claim_lease=5)
+    pairs = iter(mapper)
+    held, _ = next(pairs)
+    other = dataclasses.replace(mapper)
+    assert held not in set(i for i, _ in other)
+
+    lease = next((outputdir / "q").glob("*.lease"))
+    os.utime(lease, (0, 0))  # as if the process holding it crashed
+    again = dataclasses.replace(mapper)
+    assert [i for i, _ in again] == [held]
+    pairs.close()
+
+
+@pytest.mark.parametrize("journal", [None, "journal.jsonl"])
+def test_entries(dirs: Tuple[Path, Path], files_to_create: List[str], journal):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    expected = list(PathMapper.file_mapper(inputdir, outputdir))
+    mapper = PathMapper.file_mapper(inputdir, outputdir, journal=journal)
+    entries = list(mapper.entries())
+    assert [tuple(e) for e in entries] == expected
+    for e in entries:
+        st = e.input_path.stat()
+        assert (e.size, e.mtime_ns, e.inode, e.is_dir) == (
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_ino,
+            False,
+        )
+        assert e.output_path.parent.is_dir()
+
+
+def test_entries_name_mapper(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir, suffix=".out")
+    assert [tuple(e) for e in mapper.entries()] == list(mapper)
+    mapper = PathMapper.dir_mapper_deep(inputdir, outputdir)
+    assert [tuple(e) for e in mapper.entries()] == list(mapper)
+
+
+def test_exclude(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / ".git").mkdir()
+    (inputdir / ".git" / "HEAD").touch()
+    mapper = PathMapper.file_mapper(
+        inputdir, outputdir, glob=["**/*", "*.txt"], exclude=["**/.*", "a/"]
+    )
+    assert sorted(p.name for p in mapper.iter_input()) == [
+        "beryl.rb",
+        "coco.txt",
+        "johannesburg",
+    ]
+    with pytest.raises(TypeError):
+        PathMapper(inputdir, outputdir, exclude="**/.*")
+
+
+def test_dedupe(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    os.link(inputdir / "coco.txt", inputdir / "hard.txt")
+    os.symlink(inputdir / "a", inputdir / "link_to_a")
+    mapper = PathMapper(inputdir, outputdir, kind="file", follow_symlinks=True)
+    assert mapper.count() == len(files_to_create) + 2
+    mapper = dataclasses.replace(mapper, dedupe=True)
+    names = [p.name for p in mapper.iter_input()]
+    assert len(names) == len(files_to_create)
+    assert set(names) | {"coco.txt", "hard.txt"} == {
+        Path(f).name for f in files_to_create + ["hard.txt"]
+    }
+
+
+def test_mirror(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    (inputdir / ".hidden").mkdir()
+    (inputdir / ".hidden" / "secret.txt").touch()
+    mapper = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.rb", exclude=["**/.*"], mirror=True
+    )
+    for input_file, output_file in mapper:
+        output_file.write_text("processed")
+    assert (outputdir / "beryl.rb").read_text() == "processed"
+    assert (outputdir / "coco.txt").read_text() == "coconut"
+    assert (outputdir / "a/b/crane.txt").is_file()
+    assert (outputdir / "johannesburg").is_file()
+    assert not (outputdir / ".hidden").exists()
+    assert not (outputdir / "coco.txt").samefile(inputdir / "coco.txt")
+    with pytest.raises(ValueError):
+        dataclasses.replace(mapper, kind="dir")
+
+
+def test_mirror_hardlink(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.rb", mirror=True, mirror_hardlink=True
+    )
+    list(mapper)
+    assert (outputdir / "coco.txt").samefile(inputdir / "coco.txt")
+
+
+def test_mirror_skips_outputs(dirs: Tuple[Path, Path]):
+    inputdir, outputdir = dirs
+    inputdir.mkdir()
+    (inputdir / "scan.nii").write_text("image")
+    (inputdir / "scan.txt").write_text("notes")
+    mapper = PathMapper.file_mapper(
+        inputdir,
+        outputdir,
+        glob="**/*.nii",
+        suffix=".txt",
+        mirror=True,
+        mirror_hardlink=True,
+    )
+    for input_file, output_file in mapper:
+        output_file.write_text("processed")
+    assert (inputdir / "scan.txt").read_text() == "notes"
+    assert (outputdir / "scan.txt").read_text() == "processed"
+
+
+def test_prefetch(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    expected = list(mapper)
+    assert list(dataclasses.replace(mapper, prefetch=2)) == expected
+    assert list(dataclasses.replace(mapper, prefetch=2, prefetch_bytes=1)) == expected
+
+
+def test_iter_mmap(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    mapper = PathMapper.file_mapper(inputdir, outputdir)
+    contents = {i.name: bytes(data) for i, _, data in mapper.iter_mmap()}
+    assert contents["coco.txt"] == b"coconut"
+    assert contents["beryl.rb"] == b""
+
+
+def test_atomic_open(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    mapper = PathMapper(inputdir, outputdir, kind="file", parents="lazy")
+    for input_file, output_file in mapper:
+        if input_file.name == "coco.txt":
+            with pytest.raises(RuntimeError):
+                with mapper.atomic_open(output_file) as f:
+                    f.write("partial")
+                    raise RuntimeError("killed")
+        else:
+            with mapper.atomic_open(output_file) as f:
+                f.write("done")
+    outputs = {p.relative_to(outputdir) for p in outputdir.rglob("*") if p.is_file()}
+    assert outputs == {Path(f) for f in files_to_create if f != "coco.txt"}
+    assert (outputdir / "beryl.rb").read_text() == "done"
+    with pytest.raises(ValueError):
+        with mapper.atomic_open(outputdir / "beryl.rb", "r"):
+            pass
+
+
+@pytest.mark.parametrize(
+    "durability, expected", [("none", 0), ("batch", 4), ("file", 4)]
+)
+def test_durability(
+    mocker, dirs: Tuple[Path, Path], files_to_create: List[str], durability, expected
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.txt", durability=durability
+    )
+    fsync = mocker.spy(os, "fsync")
+    for _, output_file in mapper:
+        with mapper.atomic_path(output_file) as tmp:
+            tmp.write_text("done")
+    # 2 files in 2 directories
+    assert fsync.call_count == expected
+    assert (outputdir / "a/b/crane.txt").read_text() == "done"
+
+
+def test_plan(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    (inputdir / "coco.rb").write_text("ruby")
+    mapper = PathMapper.file_mapper(inputdir, outputdir, suffix=".out")
+    plan = mapper.plan(create_dirs=True, output="plan/plan.json")
+    assert plan.count == len(files_to_create) + 1
+    assert plan.total_bytes == 11
+    assert plan.directories == 2
+    assert list(plan.collisions) == [str(outputdir / "coco.out")]
+    assert sorted(plan.collisions[str(outputdir / "coco.out")]) == [
+        str(inputdir / "coco.rb"),
+        str(inputdir / "coco.txt"),
+    ]
+    assert (outputdir / "a/b").is_dir()
+
+    written = json.loads((outputdir / "plan/plan.json").read_text())
+    assert written["count"] == plan.count
+    assert written["total_bytes"] == plan.total_bytes
+    assert written["directories"] == plan.directories
+    assert written["collisions"] == plan.collisions
+    assert sorted(map(tuple, written["pairs"])) == sorted(
+        (str(i), str(o)) for i, o in mapper
+    )
+
+
+def test_plan_does_not_start_iteration(
+    dirs: Tuple[Path, Path], files_to_create: List[str]
+):
+    inputdir, outputdir = dirs
+    mapper = PathMapper.file_mapper(
+        inputdir, outputdir, glob="**/*.rb", mirror=True, stats="stats.json"
+    )
+    assert mapper.plan().count == 1
+    assert not outputdir.exists()
+    assert mapper._cache.mirror is None
+    assert mapper._cache.stats is None
+
+
+def test_stats(mocker, dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    mapper = PathMapper(
+        inputdir, outputdir, kind="file", stats="stats.json", stats_slowest=2
+    )
+    size = mocker.spy(chris_plugin._stats, "_size")
+    for i, o in mapper:
+        o.write_text(i.name)
+    # input sizes are taken from os.DirEntry, only outputs are stat-ed
+    assert all(Path(c.args[0]).is_relative_to(outputdir) for c in size.call_args_list)
+    report = json.loads((outputdir / "stats.json").read_text())
+    assert report["count"] == len(files_to_create)
+    assert report["input_bytes"] == 7
+    assert report["output_bytes"] == sum(len(Path(f).name) for f in files_to_create)
+    assert set(report["processing_seconds"]) == {
+        "min",
+        "mean",
+        "p50",
+        "p90",
+        "p99",
+        "max",
+    }
+    assert sum(report["processing_histogram"].values()) == len(files_to_create)
+    assert len(report["slowest"]) == 2
+    assert report["slowest"][0]["seconds"] >= report["slowest"][1]["seconds"]
+
+
+def _write_name(i: Path, o: Path) -> str:
+    o.write_text(i.name)
+    return i.name
+
+
+def test_stats_map(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    stats = inputdir.parent / "stats.json"
+    mapper = PathMapper(inputdir, outputdir, kind="file", stats=str(stats))
+    results = mapper.map(_write_name, workers=2, executor="process")
+    assert sorted(results) == sorted(Path(f).name for f in files_to_create)
+    report = json.loads(stats.read_text())
+    assert report["count"] == len(files_to_create)
+    assert report["input_bytes"] == 7
+    assert report["wait_seconds"]["min"] >= 0
+
+
+def test_stats_batches(dirs: Tuple[Path, Path], files_to_create: List[str]):
+    inputdir, outputdir = dirs
+    (inputdir / "coco.txt").write_text("coconut")
+    mapper = PathMapper(inputdir, outputdir, kind="file", stats="stats.json")
+    for batch in mapper.batches(max_items=2):
+        for i, o in batch:
+            o.write_text(i.name)
+    report = json.loads((outputdir / "stats.json").read_text())
+    assert report["count"] == len(files_to_create)
+    assert report["input_bytes"] == 7
+    assert report["output_bytes"] == sum(len(Path(f).name) for f in files_to_create)
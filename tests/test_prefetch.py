@@ -0,0 +1,38 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+import chris_plugin._prefetch as prefetch_module
+from chris_plugin._prefetch import prefetch
+
+
+@pytest.fixture
+def files(tmp_path: Path):
+    paths = []
+    for i in range(6):
+        p = tmp_path / f"{i}.dat"
+        p.write_bytes(b"x" * 100)
+        paths.append(str(p))
+    return paths
+
+
+def test_prefetch(monkeypatch, files):
+    hinted = []
+    done = threading.Event()
+
+    def record(path: str, size: int):
+        hinted.append((path, size))
+        if len(hinted) == 3:
+            done.set()
+
+    monkeypatch.setattr(prefetch_module, "_prefetch_file", record)
+    found = prefetch(((f, None) for f in files), window=2, max_bytes=250)
+    assert next(found) == (files[0], None)
+    assert done.wait(5)
+    assert hinted == [(files[0], 100), (files[1], 100), (files[2], 50)]
+    assert [path for path, _ in found] == files[1:]
+
+
+def test_prefetch_file(files):
+    prefetch_module._prefetch_file(files[0], 100)
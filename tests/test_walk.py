@@ -0,0 +1,201 @@
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from chris_plugin._walk import GlobMatcher, walk, walk_threaded
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    files = [
+        "a/b/crane.txt",
+        "a/b/c/deep.txt",
+        "a/.hidden/secret.txt",
+        "coco.txt",
+        "beryl.rb",
+        "johannesburg",
+        "empty/",
+        "nested/empty/",
+    ]
+    for f in files:
+        p = tmp_path / f
+        if f.endswith("/"):
+            p.mkdir(parents=True)
+        else:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            p.touch()
+    os.symlink(tmp_path / "a", tmp_path / "link_to_a")
+    os.symlink(tmp_path / "coco.txt", tmp_path / "a/link_to_coco.txt")
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "globs",
+    [
+        ["**/*"],
+        ["*"],
+        ["**/"],
+        ["*/"],
+        ["**"],
+        ["**/*.txt"],
+        ["*/*"],
+        ["*/**"],
+        ["*/b/*.txt"],
+        ["a/b/crane.txt"],
+        ["**/b/**/*.txt"],
+        ["**/*.txt", "**/*.rb"],
+        ["**/*.txt", "**/*"],
+        ["**/*.something", "another"],
+    ],
+)
+def test_same_as_pathlib(tree: Path, globs: List[str]):
+    expected = set(p for g in globs for p in tree.glob(g))
+    actual = [Path(e.path) for e in walk(str(tree), globs)]
+    assert len(actual) == len(set(actual))
+    assert set(actual) == expected
+
+
+def test_kind(tree: Path):
+    files = {Path(e.path) for e in walk(str(tree), ["**/*"], kind="file")}
+    dirs = {Path(e.path) for e in walk(str(tree), ["**/*"], kind="dir")}
+    assert files == {p for p in tree.glob("**/*") if p.is_file()}
+    assert dirs == {p for p in tree.glob("**/*") if p.is_dir()}
+
+
+def test_preorder(tree: Path):
+    paths = [Path(e.path) for e in walk(str(tree), ["**/*"])]
+    assert paths.index(tree / "coco.txt") < paths.index(tree / "a/b/crane.txt")
+    assert paths.index(tree / "a/b") < paths.index(tree / "a/b/c/deep.txt")
+
+
+@pytest.mark.parametrize("glob", ["", "/abs/*"])
+def test_bad_glob(tmp_path: Path, glob: str):
+    with pytest.raises((ValueError, NotImplementedError)):
+        list(walk(str(tmp_path), [glob]))
+
+
+def _is_leaf(p: Path) -> bool:
+    return p.is_dir() and not any(c.is_dir() for c in p.iterdir())
+
+
+@pytest.mark.parametrize("globs", [["**/"], ["*/"], ["a/**/"], ["**/", "a/*/"]])
+def test_leaf(tree: Path, globs: List[str]):
+    expected = set(p for g in globs for p in tree.glob(g) if _is_leaf(p))
+    actual = [Path(e.path) for e in walk(str(tree), globs, kind="leaf")]
+    assert len(actual) == len(set(actual))
+    assert set(actual) == expected
+
+
+def test_leaf_root(tmp_path: Path):
+    assert [e.path for e in walk(str(tmp_path), ["**/"], kind="leaf")] == [
+        str(tmp_path)
+    ]
+
+
+def test_leaf_reads_each_directory_once(monkeypatch, tree: Path):
+    reads = Counter()
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        reads[path] += 1
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    list(walk(str(tree), ["**/"], kind="leaf"))
+    assert set(reads.values()) == {1}
+
+
+@pytest.mark.parametrize("kind", [None, "file", "leaf"])
+@pytest.mark.parametrize("globs", [["**/*"], ["**/"], ["*/b/*.txt", "**/*.rb"]])
+def test_threaded_ordered(tree: Path, globs: List[str], kind):
+    expected = [e.path for e in walk(str(tree), globs, kind)]
+    actual = [e.path for e in walk_threaded(str(tree), globs, kind, workers=3)]
+    assert actual == expected
+
+
+@pytest.mark.parametrize("kind", [None, "file", "leaf"])
+@pytest.mark.parametrize("globs", [["**/*"], ["**/"], ["*/b/*.txt", "**/*.rb"]])
+def test_threaded_unordered(tree: Path, globs: List[str], kind):
+    expected = Counter(e.path for e in walk(str(tree), globs, kind))
+    actual = Counter(
+        e.path for e in walk_threaded(str(tree), globs, kind, workers=3, ordered=False)
+    )
+    assert actual == expected
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_threaded_stop_early(tree: Path, ordered: bool):
+    entries = walk_threaded(str(tree), ["**/*"], workers=2, ordered=ordered)
+    assert next(entries) is not None
+    entries.close()
+
+
+@pytest.mark.parametrize(
+    "exclude",
+    [
+        ["**/.*"],
+        ["a/b"],
+        ["**/*.txt", "*.rb"],
+        ["**/"],
+        [re.compile(r"a/.*")],
+        [re.compile(r".*\.txt"), "johannesburg"],
+    ],
+)
+def test_exclude(tree: Path, exclude: list):
+    def is_excluded(p: Path) -> bool:
+        rel = p.relative_to(tree)
+        for e in exclude:
+            if isinstance(e, str):
+                if any(x == p or x in p.parents for x in tree.glob(e)):
+                    return True
+            elif any(e.fullmatch(str(r)) for r in [rel, *rel.parents][:-1]):
+                return True
+        return False
+
+    expected = set(p for p in tree.glob("**/*") if not is_excluded(p))
+    actual = set(Path(e.path) for e in walk(str(tree), ["**/*"], exclude=exclude))
+    assert actual == expected
+
+
+def test_exclude_not_read(monkeypatch, tree: Path):
+    reads = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        reads.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    list(walk(str(tree), ["**/*.txt"], exclude=["**/.hidden", "a/b/"]))
+    assert str(tree / "a/.hidden") not in reads
+    assert str(tree / "a/b") not in reads
+    assert str(tree / "a/b/c") not in reads
+    assert str(tree / "empty") in reads
+
+
+def test_follow_symlinks(tree: Path):
+    os.symlink(tree, tree / "a/b/up")
+    paths = set(
+        Path(e.path) for e in walk(str(tree), ["**/*.txt"], follow_symlinks=True)
+    )
+    assert tree / "link_to_a/b/crane.txt" in paths
+    assert tree / "a/b/crane.txt" in paths
+    assert not any("up" in p.parts for p in paths)
+    assert set(Path(e.path) for e in walk(str(tree), ["**/*.txt"])) == set(
+        tree.glob("**/*.txt")
+    )
+
+
+@pytest.mark.parametrize("globs", [["**/*.txt"], ["*/b/*"], ["a/**"], ["*"]])
+def test_matches_path(tree: Path, globs: List[str]):
+    matcher = GlobMatcher(globs)
+    files = [p for p in tree.glob("**/*") if p.is_file()]
+    expected = set(p for g in globs for p in tree.glob(g) if p in files)
+    actual = set(
+        p for p in files if matcher.matches_path(str(p.relative_to(tree)), False)
+    )
+    assert actual == expected